@@ -4,15 +4,16 @@ from rich.layout import Layout
 from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
-from unidecode import unidecode
 
 import recipe
 from bar_pkg import bar_menu, stock, occupancy, stats
+from bar_pkg.rng import SimulationRNG
 from data import ingredients
 from display.rich_console import console
 from interface import commands
 from recipe import Recipe
 from utility import logger
+from utility.clock import GameClock
 
 
 class Screen(Enum):
@@ -35,6 +36,7 @@ class Bar:
         self.stock = stock.BarStock(self)
         self.menu = bar_menu.BarMenu(self)
         self.occupancy = occupancy.Occupancy(self)
+        self.clock = GameClock()
         self.recipes = {}
         self.screen = Screen.MAIN
 
@@ -75,8 +77,7 @@ class Bar:
         type_lst = set()
         ingredient_args = commands.items_to_commands(ingredients.all_ingredients)
         for typ in ingredients.all_ingredient_types():
-            obj = typ()
-            type_cmd = unidecode(obj.format_type().lower())
+            type_cmd = ingredients.type_info(typ).command
             if type_cmd not in type_args:
                 type_args.add(type_cmd)
                 type_lst.add(typ)
@@ -101,7 +102,7 @@ class Bar:
             cmds.add("finish")
 
             # Get input
-            cmd = commands.input_loop(rcp_write_prompt, cmds, bar=self)[0]
+            cmd = commands.input_loop(rcp_write_prompt, cmds, bar=self, search_items=ingredients.all_ingredients)[0]
 
             if cmd == "finish":
                 recipe_name = None
@@ -118,18 +119,15 @@ class Bar:
             # If not a command, try to match input to a type of ingredient
             matching_type = None
             matching_type_object = None
-            for type_arg in type_args:
-                if cmd == type_arg:
-                    matching_type = commands.command_to_item(type_arg, type_lst)
-                    matching_type_object = matching_type()
-                    ingredient = matching_type_object.format_type()
+            if cmd in type_args:
+                matching_type = commands.command_to_item(cmd, type_lst)
+                matching_type_object = matching_type()
+                ingredient = matching_type_object.format_type()
 
             # If not a type of ingredient, match to a specific ingredient
-            if matching_type_object is None:
-                for ingredient_arg in ingredient_args:
-                    if cmd == ingredient_arg:
-                        matching_type_object = commands.command_to_item(ingredient_arg, ingredients.all_ingredients)
-                        ingredient = matching_type_object.name
+            if matching_type_object is None and cmd in ingredient_args:
+                matching_type_object = commands.command_to_item(cmd, ingredients.all_ingredients)
+                ingredient = matching_type_object.name
 
             if matching_type_object is None:
                 console.print("[error]No matching type or ingredient")
@@ -193,6 +191,12 @@ class Bar:
 
     # </editor-fold>
 
+    def get_clock(self):
+        """Returns the bar's game clock, creating it for bars from older saves."""
+        if getattr(self, "clock", None) is None:
+            self.clock = GameClock()
+        return self.clock
+
     def get_screen(self):
         """Get the name of the screen the bar is currently on."""
         return self.screen.name
@@ -205,22 +209,38 @@ class Bar:
                 self.screen = screen
                 break
 
-    def make_sale(self, menu_item: ingredients.MenuItem):
-        if self.stock.has_enough(menu_item):
-            self.stock.pour(menu_item)
-            self.bar_stats.balance += menu_item.current_price()
-            logger.log(f"Balance +${menu_item.current_price()} ({self.bar_stats.balance})")
-            '''self.reputation += 1
-            logger.log(f"Reputation +1 ({self.reputation})")'''
-            return True
-        else:
-            self.occupancy.print_msg(f"[error]Not enough {menu_item.name}![/error]")
-            return False
-
-    def end_day(self):
-        for group in self.occupancy.current_customer_groups:
-            group.leave()
-        self.occupancy.event_log = []
+    def fulfil_round(self, orders, pours=None):
+        """
+        Pours a round of orders together, taking payment for each one that could be poured.
+
+        :param orders: The menu items ordered, in the order they were placed.
+        :param pours: Optional list to collect what was poured for each order, as in BarStock.fulfil.
+        :return: A list with True for each order poured, or False where the stock ran out.
+        """
+        poured = self.stock.fulfil(orders, pours)
+        for menu_item, success in zip(orders, poured):
+            if success:
+                self.bar_stats.balance += menu_item.current_price()
+                logger.log(f"Balance +${menu_item.current_price()} ({self.bar_stats.balance})")
+            else:
+                self.occupancy.print_msg(f"[error]Not enough {menu_item.name}![/error]")
+        return poured
+
+    def end_day(self, game_time=None):
+        """
+        Closes the bar for the day, sending any remaining customers home and resetting the day's occupancy state.
+
+        :param game_time: The in-game time the bar closed at, for the departure messages.
+        """
+        # Copy, since each group removes itself from the current groups as it leaves
+        for group in self.occupancy.current_customer_groups.copy():
+            group.leave(self, game_time)
+        self.occupancy.archive_event_log(None)  # Closes the day's archive, if it was kept
+        self.occupancy.clear_event_log()
         self.occupancy.last_new_customer_time = None
         self.occupancy.last_return_customer_time = None
+        self.occupancy.clear_events()
+        # Fresh random streams for the next day, so each day can be replayed from its own seed
+        self.occupancy.rng = SimulationRNG()
+        logger.log(f"Next day's random seed: {self.occupancy.rng.seed}")
         self.set_screen("MAIN")
@@ -10,7 +10,7 @@ import recipe
 from data import ingredients
 from data.ingredients import Beer, Cider, Wine, Mead, MenuItem, list_ingredients, Ingredient
 from display.rich_console import console
-from interface.commands import items_to_commands, find_command, command_to_item, input_loop
+from interface.commands import items_to_commands, find_command, command_to_item, input_loop, CommandNames
 from recipe import Recipe
 from utility import logger
 
@@ -24,6 +24,7 @@ class BarMenu:
         self.cider: list[Cider] = []
         self.wine: list[Wine] = []
         self.mead: list[Mead] = []
+        self.names_cache = {}  # {section type, or None for the full menu: CommandNames}, see get_command_names
 
     # <editor-fold desc="List">
     def list_full_menu(self):
@@ -46,9 +47,9 @@ class BarMenu:
             for category in self.list_menu_by_section():
                 if item.lower() == category[1].lower():
                     return category[0]
-            menu_item = find_command(item, items_to_commands(self.list_full_menu()))
+            menu_item = find_command(item, items_to_commands(self.get_command_names()))
             if menu_item:
-                item = command_to_item(menu_item, self.list_full_menu())
+                item = command_to_item(menu_item, self.get_command_names())
         elif isinstance(item, type):
             for section in self.list_menu_by_section():
                 if section[2] == item:
@@ -59,6 +60,25 @@ class BarMenu:
                     return section
         return None
 
+    def get_command_names(self, section_type: type = None):
+        """
+        Returns the command names for the full menu or one section of it, only building them the first time they're
+        needed after the menu has changed.
+
+        :param section_type: The section's type, i.e. Beer, or None for the full menu.
+        """
+        if getattr(self, "names_cache", None) is None:  # Menus from older saves have no cache yet
+            self.names_cache = {}
+        names = self.names_cache.get(section_type)
+        if names is None:
+            lst = self.list_full_menu() if section_type is None else self.get_section(section_type)
+            names = self.names_cache[section_type] = CommandNames(lst)
+        return names
+
+    def menu_changed(self):
+        """Drops the command names built for the menu. Call after adding or removing menu items."""
+        self.names_cache = {}
+
     # </editor-fold>
 
     # <editor-fold desc="Display">
@@ -198,6 +218,7 @@ class BarMenu:
             elif isinstance(menu_item, Mead):
                 self.mead = new_section
 
+        self.menu_changed()
         logger.log("Menu reloaded.")
 
     def select_to_add(self, add_typ, add_arg=""):
@@ -224,7 +245,7 @@ class BarMenu:
                 ingredient = command_to_item(ing_command, inv_ingredients)
                 if ingredient:
                     # Add to menu
-                    self.bar.menu.__getattribute__(add_typ.__name__).append(ingredient)
+                    self.add(ingredient)
                     return True
                 else:
                     console.print("[error]Valid ingredient arg given to add command, but ingredient not found")
@@ -284,6 +305,7 @@ class BarMenu:
     def add(self, item):
         """Adds an item to the menu under the proper section."""
         self.get_section(item).append(item)
+        self.menu_changed()
 
     def remove(self, remove_arg):
         """
@@ -292,11 +314,12 @@ class BarMenu:
         :param remove_arg: The user's input on which item to remove
         :return: True if item successfully removed, else False
         """
-        item_cmd = find_command(remove_arg, items_to_commands(self.list_full_menu()))
+        item_cmd = find_command(remove_arg, items_to_commands(self.get_command_names()))
         if item_cmd:
-            rmv_item = command_to_item(item_cmd, self.list_full_menu())
+            rmv_item = command_to_item(item_cmd, self.get_command_names())
             menu_section = self.get_section(rmv_item)
             menu_section.remove(rmv_item)
+            self.menu_changed()
             logger.log(f"Removing {rmv_item.name} from the menu.")
             return True
         else:
@@ -316,14 +339,15 @@ class BarMenu:
             return False
         else:
             category_strings = [cat[1].lower() for cat in self.list_menu_by_section()]
-            menu_args = items_to_commands(self.list_full_menu()).union(set(category_strings))
+            menu_args = items_to_commands(self.get_command_names()).union(set(category_strings))
             cmd = find_command(mark_arg, menu_args)
             if cmd in menu_args:
-                item = command_to_item(cmd, self.list_full_menu() + [section[2] for section in self.list_menu_by_section()])
+                # Menu items take the command before section types
+                item = (command_to_item(cmd, self.get_command_names())
+                        or command_to_item(cmd, [section[2] for section in self.list_menu_by_section()]))
                 if isinstance(item, type):
-                    obj = item()
-                    style = obj.get_style()
-                    name = obj.format_type()
+                    style = ingredients.type_info(item).style
+                    name = ingredients.type_info(item).name
                 else:
                     style = item.get_style()
                     name = item.name
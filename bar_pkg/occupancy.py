@@ -1,24 +1,62 @@
-import random
+import heapq
+import logging
+import os
+from collections import deque
+from logging.handlers import RotatingFileHandler
 
 from rich.panel import Panel
 
 import customer
 import utility.clock
+from bar_pkg.rng import SimulationRNG
 from display.rich_console import console
 from utility import logger, utils
 
+# Kinds of scheduled customer events, in the order they are handled when due on the same tick
+ENTER, ORDER, LEAVE = 0, 1, 2
+# Rows of the play screen taken up by things other than event log lines
+event_log_occupied_height = 5
+# Size at which the event log archive rolls over, and how many rolled over archives are kept
+archive_max_bytes = 1024 * 1024
+archive_backup_count = 3
+
 class Occupancy:
     def __init__(self, bar):
         self.bar = bar
         self.opening_time = 16 * 60
         self.closing_time = 26 * 60
         self.current_customer_groups = set()
-        self.event_log = []
+        self.event_log = deque(maxlen=self.event_log_lines())  # Only the lines that fit on screen are kept
+        self.archive_events = False  # Whether the player has turned on keeping the full event log on disk
+        self.event_log_archive = None  # File path every event log message is appended to while archiving
+        self.archive_handler = None  # Kept open on event_log_archive while archiving; not saved, see __getstate__
+        self.log_panel = None  # Rebuilt only when new lines arrive; not saved, see __getstate__
         self.customer_displayed = None
 
         self.group_id_counter = 1
         self.last_new_customer_time = None
         self.last_return_customer_time = None
+        self.day_report = None  # Set while a headless day is being simulated
+        self.event_queue = []  # Heap of (game minute, event kind, sequence number, group)
+        self.event_counter = 0
+        self.rng = SimulationRNG()
+
+    def __getstate__(self):
+        """Leaves the cached panel and the open archive out of saves. Both are recreated when next needed."""
+        state = self.__dict__.copy()
+        state["log_panel"] = None
+        state["archive_handler"] = None
+        return state
+
+    def get_rng(self):
+        """Returns the random streams customer events draw from, creating them for bars from older saves."""
+        if getattr(self, "rng", None) is None:
+            self.rng = SimulationRNG()
+        return self.rng
+
+    def active_report(self):
+        """Returns the report recording the current simulated day, if there is one."""
+        return getattr(self, "day_report", None)  # Bars from older saves have no report attribute
 
     def print_msg(self, msg, game_time=None):
         """
@@ -31,81 +69,181 @@ class Occupancy:
             timestamp = utility.clock.print_time(game_time)
             msg = f"{timestamp}: {msg}"
 
-        # Divide the message so it wraps when it reaches the panel's width
-        line_width = int((console.width / 2) - 6) # Panel borders take up 6 characters' width
-        lines = utils.split_with_markup(msg, line_width)
-        # Print lines to game screen
-        for line in lines:
-            self.event_log.append(line)
+        event_log = self.get_event_log()
+        if self.active_report():
+            # Nothing is rendered during a headless simulation, so skip wrapping to the panel's width
+            event_log.append(msg)
+        else:
+            # Divide the message so it wraps when it reaches the panel's width
+            line_width = int((console.width / 2) - 6) # Panel borders take up 6 characters' width
+            lines = utils.split_with_markup(msg, line_width)
+            # Print lines to game screen
+            for line in lines:
+                event_log.append(line)
+        self.log_panel = None
+
+        # Keep the full history on disk if requested, since the on-screen log only holds what fits
+        archive_handler = self.get_archive_handler()
+        if archive_handler and not self.active_report():
+            archive_handler.handle(logging.makeLogRecord({"msg": msg}))
 
         # Also print to the logger
         logger.log(msg)
 
+    # <editor-fold desc="Event log">
+    @staticmethod
+    def event_log_lines():
+        """Returns how many event log lines fit on the play screen."""
+        return max(console.height - event_log_occupied_height, 1)
+
+    def get_event_log(self):
+        """
+        Returns the ring buffer of recent event log lines, resizing it if the console has been resized, and converting
+        the unbounded list kept by bars from older saves.
+        """
+        event_log = self.event_log
+        if not isinstance(event_log, deque) or event_log.maxlen != self.event_log_lines():
+            self.event_log = deque(event_log, maxlen=self.event_log_lines())
+            self.log_panel = None
+        return self.event_log
+
+    def clear_event_log(self):
+        """Empties the event log, for when the bar closes."""
+        self.get_event_log().clear()
+        self.log_panel = None
+
+    def archiving_enabled(self):
+        """Returns whether the player has turned on archiving the event log."""
+        return getattr(self, "archive_events", False)  # Bars from older saves have no archive setting
+
+    def set_archiving(self, enabled, path=None):
+        """
+        Turns archiving the event log on or off. The setting is saved with the bar.
+
+        :param enabled: Whether to archive.
+        :param path: The file to archive to from now on, if enabled.
+        """
+        self.archive_events = enabled
+        self.archive_event_log(path if enabled else None)
+
+    def archive_event_log(self, path):
+        """
+        Appends every event log message from now on to the given file, so the day's full history is kept. The file
+        rolls over once it reaches archive_max_bytes. Messages from headless simulations aren't archived.
+
+        :param path: The file to append to, or None to stop archiving and close the file.
+        """
+        if path == getattr(self, "event_log_archive", None):
+            return
+        archive_handler = getattr(self, "archive_handler", None)
+        if archive_handler:
+            archive_handler.close()
+        self.archive_handler = None
+        self.event_log_archive = path
+
+    def get_archive_handler(self):
+        """Returns the open event log archive, opening it on first use, or None if the event log isn't archived."""
+        archive = getattr(self, "event_log_archive", None)  # Bars from older saves have no archive attributes
+        if archive and getattr(self, "archive_handler", None) is None:
+            os.makedirs(os.path.dirname(archive) or ".", exist_ok=True)
+            # Flushed after each message, so each one reaches the file without reopening it
+            self.archive_handler = RotatingFileHandler(archive, maxBytes=archive_max_bytes,
+                                                       backupCount=archive_backup_count, encoding="utf-8")
+        return getattr(self, "archive_handler", None)
+
     def event_log_panel(self):
         """
         Formats and returns the panel that shows the player everything that happens while the bar is open.
+        The same panel is returned until new lines are logged.
 
         :return: The panel object.
         """
-        log_str = ""
-        log_lines = self.event_log
-        occupied_height = 5
+        event_log = self.get_event_log()
+        if getattr(self, "log_panel", None) is None:
+            log_str = "".join(f"{line}\n" for line in event_log)
+            self.log_panel = Panel(title="Event Log", renderable=log_str)
+        return self.log_panel
 
-        # Cut off old lines when the panel reaches capacity
-        if len(self.event_log) > console.height - occupied_height:
-            log_lines = self.event_log[-(console.height - occupied_height):]
+    # </editor-fold>
 
-        # Populate the string that will be printed with each line of text
-        for line in log_lines:
-            log_str = log_str + line + "\n"
+    # <editor-fold desc="Event scheduling">
+    def scheduled_events(self):
+        """Returns the heap of scheduled customer events, rebuilding it for bars from older saves without one."""
+        if getattr(self, "event_queue", None) is None:
+            self.event_queue = []
+            self.event_counter = 0
+            for group in self.current_customer_groups:
+                self.schedule_group(group)
+        return self.event_queue
 
-        panel = Panel(title="Event Log", renderable=log_str)
-        return panel
+    def schedule_event(self, due_time, kind, group=None):
+        """
+        Adds a customer event to the queue.
+
+        :param due_time: The event fires on the first tick after this in-game time.
+        :param kind: ENTER, ORDER or LEAVE.
+        :param group: The customer group the event is for, if any.
+        """
+        queue = self.scheduled_events()
+        # The counter keeps events due at the same time in the order they were scheduled, and means groups are never
+        # compared to each other
+        self.event_counter += 1
+        heapq.heappush(queue, (due_time + 1, kind, self.event_counter, group))
+
+    def schedule_group(self, group):
+        """Schedules a group's next round and its departure."""
+        # Order the first round 5 minutes in, and subsequent rounds ~30min apart
+        if group.last_round is None:
+            self.schedule_event(group.arrival + 5, ORDER, group)
+        else:
+            self.schedule_event(group.last_round + 30, ORDER, group)
+        self.schedule_event(group.arrival + 90, LEAVE, group)
+
+    def next_event_time(self):
+        """Returns the in-game time at which the next scheduled event will fire, or None if nothing is scheduled."""
+        queue = self.scheduled_events()
+        return queue[0][0] if queue else None
+
+    def clear_events(self):
+        """Drops every scheduled event, for when the bar closes."""
+        self.event_queue = []
+    # </editor-fold>
 
     def check_customer_events(self, game_time):
         """
-        Checks for prerequisite conditions, and if indicated, triggers customers entering, ordering, and leaving.
+        Fires the customer entries, rounds, and departures that have come due by the given time.
 
         :param game_time: The current in-game time.
         """
-        def check_customer_entry():
-            """Triggers customers to enter based on how long it's been since the last customers entered."""
+        queue = self.scheduled_events()
+        # The first customers enter as soon as the bar opens
+        if self.last_new_customer_time is None:
+            self.schedule_event(game_time - 1, ENTER)
 
-            # Stop entering customers at midnight
-            if game_time > 24 * 60:
-                return
+        due = []
+        while queue and queue[0][0] <= game_time:
+            due.append(heapq.heappop(queue))
+        # If the clock skipped ahead, still handle entries before orders before departures
+        due.sort(key=lambda event: (event[1], event[2]))
 
-            if not self.last_new_customer_time:
-                self.enter_new_customer_group(game_time)
-            elif game_time > self.last_new_customer_time + 20:
-                self.enter_new_customer_group(game_time)
-            else:
-                return
-            self.last_new_customer_time = game_time
-
-        def check_customer_orders():
-            """Triggers orders from customers based on when they ordered their last round."""
-            groups_at_start = self.current_customer_groups.copy() # Ensures set doesn't change size during iteration
-            for group in groups_at_start:
-                # Order the first round 5 minutes in
-                if group.last_round is None:
-                    ref_time = group.arrival + 5
-                # Order subsequent rounds ~30min apart
-                else:
-                    ref_time = group.last_round + 30
-                if game_time > ref_time:
-                    group.order_round(self.bar, game_time)
-                    group.last_round = game_time
-
-        def check_customers_leaving():
-            """Triggers customers to leave based on how long they've been in the bar."""
-            for group in self.current_customer_groups.copy():
-                if game_time > group.arrival + 90:
-                    group.leave(self.bar, game_time)
-
-        check_customer_entry()
-        check_customer_orders()
-        check_customers_leaving()
+        for _, kind, _, group in due:
+            if kind == ENTER:
+                # Stop entering customers at midnight
+                if game_time > 24 * 60:
+                    continue
+                group = self.enter_new_customer_group(game_time)
+                self.last_new_customer_time = game_time
+                self.schedule_event(game_time + 20, ENTER)
+                self.schedule_group(group)
+            # Groups that have already left may still have events in the queue
+            elif group not in self.current_customer_groups:
+                continue
+            elif kind == ORDER:
+                group.order_round(self.bar, game_time)
+                group.last_round = game_time
+                self.schedule_event(game_time + 30, ORDER, group)
+            elif kind == LEAVE:
+                group.leave(self.bar, game_time)
 
     def current_customers(self):
         """Returns a list of all customers currently in the bar."""
@@ -144,10 +282,11 @@ class Occupancy:
                        4: 0.5,
                        5: 0.025,
                        6: 0.025}
-        headcount = random.choices(list(group_sizes.keys()), weights=list(group_sizes.values()))[0]
+        arrivals = self.get_rng().arrivals
+        headcount = arrivals.choices(list(group_sizes.keys()), weights=list(group_sizes.values()))[0]
 
         new_customers = True
-        if len(self.bar.bar_stats.past_customers) >= 6 and random.randrange(3) > 2: # 1/3 will be returning customers
+        if len(self.bar.bar_stats.past_customers) >= 6 and arrivals.randrange(3) > 2: # 1/3 will be returning customers
             new_customers = False
 
         log_msg = f"[attn]New customers enter![/attn] - " if new_customers \
@@ -155,11 +294,11 @@ class Occupancy:
 
         # TODO: Repeat patrons
         # Create new customers
-        customers = set()
+        customers = [] # Kept in order, so members order in the same sequence when a day is replayed
         group_id = self.new_group_id()
         for i in range(headcount):
             cstmr = customer.create_customer(bar=self.bar)
-            customers.add(cstmr)
+            customers.append(cstmr)
             if i == headcount - 1 and headcount > 1:
                 log_msg = log_msg + "and "
             log_msg = log_msg + cstmr.format_name()
@@ -177,3 +316,6 @@ class Occupancy:
 
         self.current_customer_groups.add(group)
         self.print_msg(log_msg, game_time)
+        if self.active_report():
+            self.active_report().record_arrival(game_time, group)
+        return group
@@ -0,0 +1,33 @@
+import random
+
+
+class SimulationRNG:
+    """
+    Independent random streams for each part of a day at the bar, all derived from one seed so the day can be replayed.
+    Each stream is its own random.Random, so e.g. a change to what customers say doesn't shift which drinks get ordered.
+    """
+    streams = ("arrivals", "customers", "ordering", "ingredients", "dialogue")
+
+    def __init__(self, seed=None):
+        """
+        :param seed: Any int or string. Leave None to pick a fresh seed at random.
+        """
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        # Seeding with a string hashes it with SHA-512, so streams don't depend on the process's hash randomization
+        self.arrivals = random.Random(f"{seed}/arrivals")
+        self.customers = random.Random(f"{seed}/customers")
+        self.ordering = random.Random(f"{seed}/ordering")
+        self.ingredients = random.Random(f"{seed}/ingredients")
+        self.dialogue = random.Random(f"{seed}/dialogue")
+
+    def spawn(self, key):
+        """
+        Derives a child context whose streams don't overlap with this one's or any other child's, e.g. one per
+        simulated day or per worker process.
+
+        :param key: Distinguishes this child from its siblings.
+        :return: The new SimulationRNG.
+        """
+        return SimulationRNG(f"{self.seed}/{key}")
@@ -0,0 +1,276 @@
+import math
+import os
+import pickle
+import re
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import customer
+from bar_pkg import trace as event_trace
+from bar_pkg.rng import SimulationRNG
+from data import ingredients
+from utility import logger
+
+# Pickled bar that each worker process simulates fresh copies of, and where to save each day's trace, set by _init_worker
+_worker_bar_bytes = None
+_worker_trace_dir = None
+
+
+class DayReport:
+    """Structured record of everything sold, missed, and who came and went over one simulated day."""
+
+    def __init__(self, opening_time, closing_time, starting_balance, seed=None, trace=None):
+        self.seed = seed  # Replaying the day with this seed reproduces it exactly
+        self.opening_time = opening_time
+        self.closing_time = closing_time
+        self.starting_balance = starting_balance
+        self.ending_balance = starting_balance
+        self.sales = []  # [(game_time, customer name, item name, price)]
+        self.stockouts = []  # [(game_time, customer name, item name)]
+        self.arrivals = []  # [(game_time, group id, headcount)]
+        self.departures = []  # [(game_time, group id, headcount)]
+        self.real_secs = 0.0
+        self.trace = trace  # Optional EventTrace of every event, including those with no totals here
+
+    # <editor-fold desc="Recording">
+    def record_sale(self, game_time, cstmr, menu_item, price):
+        self.sales.append((game_time, cstmr.name, menu_item.name, price))
+        if self.trace is not None:
+            self.trace.record_customer(event_trace.SALE, game_time, cstmr, menu_item.name, price)
+
+    def record_stockout(self, game_time, cstmr, menu_item):
+        self.stockouts.append((game_time, cstmr.name, menu_item.name))
+        if self.trace is not None:
+            self.trace.record_customer(event_trace.STOCKOUT, game_time, cstmr, menu_item.name,
+                                       menu_item.current_price())
+
+    def record_arrival(self, game_time, group):
+        self.arrivals.append((game_time, group.group_id, len(group.customers)))
+        if self.trace is not None:
+            self.trace.record(event_trace.ARRIVAL, game_time, group=group.group_id, amount=len(group.customers))
+
+    def record_departure(self, game_time, group):
+        self.departures.append((game_time, group.group_id, len(group.customers)))
+        if self.trace is not None:
+            self.trace.record(event_trace.DEPARTURE, game_time, group=group.group_id, amount=len(group.customers))
+
+    def record_order(self, game_time, cstmr, menu_item):
+        if self.trace is not None:
+            self.trace.record_customer(event_trace.ORDER, game_time, cstmr, menu_item.name, menu_item.current_price())
+
+    def record_pours(self, game_time, cstmr, pours):
+        """Records the volume of each ingredient poured for a customer's drink, from a {ingredient: volume} dict."""
+        if self.trace is not None:
+            for ingredient, vol in pours.items():
+                self.trace.record_customer(event_trace.POUR, game_time, cstmr, ingredient.name, vol)
+
+    def record_comment(self, game_time, cstmr, msg):
+        if self.trace is not None:
+            self.trace.record_customer(event_trace.COMMENT, game_time, cstmr, msg)
+
+    def record_price(self, game_time, menu_item, price):
+        if self.trace is not None:
+            self.trace.record(event_trace.PRICE_CHANGE, game_time, item=menu_item.name, amount=price)
+
+    # </editor-fold>
+
+    # <editor-fold desc="Totals">
+    def revenue(self):
+        """Total taken in from sales over the day."""
+        return round(sum(sale[3] for sale in self.sales), 2)
+
+    def items_sold(self):
+        """Counts of each menu item sold, by name."""
+        return Counter(sale[2] for sale in self.sales)
+
+    def items_stocked_out(self):
+        """Counts of orders that could not be poured, by menu item name."""
+        return Counter(stockout[2] for stockout in self.stockouts)
+
+    def customers_served(self):
+        """Total number of customers that came in over the day."""
+        return sum(arrival[2] for arrival in self.arrivals)
+
+    def summary(self):
+        """Returns the day's totals as a plain dict."""
+        return {
+            "seed": self.seed,
+            "revenue": self.revenue(),
+            "starting_balance": self.starting_balance,
+            "ending_balance": self.ending_balance,
+            "sales": len(self.sales),
+            "stockouts": len(self.stockouts),
+            "groups": len(self.arrivals),
+            "customers": self.customers_served(),
+            "departures": len(self.departures),
+            "items_sold": dict(self.items_sold()),
+            "items_stocked_out": dict(self.items_stocked_out()),
+            "real_secs": round(self.real_secs, 3),
+        }
+    # </editor-fold>
+
+
+def simulate_day(bar, seed=None, trace=False):
+    """
+    Runs a full day at the bar from opening to closing time as fast as possible, through the same customer, ordering
+    and stock logic as the live play screen, but with no console rendering.
+
+    The bar is modified as if the day had been played - stock is poured and sales are added to the balance - so pass a
+    copy to evaluate a menu without changing a saved bar.
+
+    :param bar: The bar to run the day at.
+    :param seed: Seed for the day's random streams, to replay a day from its report. Leave None for a new day.
+    :param trace: Whether to also record every event of the day in an EventTrace, as report.trace.
+    :return: The DayReport for the day.
+    """
+    occupancy = bar.occupancy
+    occupancy.rng = SimulationRNG(seed)
+    report = DayReport(occupancy.opening_time, occupancy.closing_time, bar.bar_stats.balance, occupancy.rng.seed,
+                       trace=event_trace.EventTrace(occupancy.rng.seed) if trace else None)
+    # The day's prices, so the trace can be read on its own. They can't change until the day is over
+    for menu_item in bar.menu.list_full_menu():
+        report.record_price(occupancy.opening_time, menu_item, menu_item.current_price())
+    logger.log(f"Simulating day at {bar.bar_stats.bar_name}...")
+
+    # Simulated customers shouldn't use up names, and each day should draw from the same pool to be replayable
+    unused_names = customer.customer_names.copy()
+    previous_screen = bar.get_screen()
+    # Stock messages go to the event log rather than the console while on the play screen
+    bar.set_screen("PLAY")
+    occupancy.day_report = report
+    start = time.perf_counter()
+    try:
+        # Jump straight from one scheduled event to the next; nothing happens on the minutes in between
+        game_time = occupancy.opening_time
+        while game_time is not None and game_time < occupancy.closing_time:
+            occupancy.check_customer_events(game_time)
+            game_time = occupancy.next_event_time()
+        bar.end_day(occupancy.closing_time)
+    finally:
+        occupancy.day_report = None
+        bar.set_screen(previous_screen)
+        customer.customer_names.clear()
+        customer.customer_names.update(unused_names)
+
+    report.real_secs = time.perf_counter() - start
+    report.ending_balance = bar.bar_stats.balance
+    logger.log(f"Simulated day: {report.summary()}")
+    return report
+
+
+# <editor-fold desc="Monte Carlo">
+def confidence_interval(values, z=1.96):
+    """
+    Returns the mean of the given values and the normal-approximation confidence interval around it (95% by default).
+
+    :return: A tuple of (mean, low, high).
+    """
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, mean, mean
+    margin = z * statistics.stdev(values) / math.sqrt(len(values))
+    return mean, mean - margin, mean + margin
+
+
+class MonteCarloReport:
+    """Aggregates the summaries of many independently simulated days at the same bar."""
+
+    def __init__(self, summaries, seeds):
+        self.summaries = summaries
+        self.seeds = seeds
+
+    def revenue(self):
+        """Mean daily revenue with its confidence interval, as (mean, low, high)."""
+        return confidence_interval([summary["revenue"] for summary in self.summaries])
+
+    def stockouts(self):
+        """Mean number of orders per day that couldn't be poured, with its confidence interval."""
+        return confidence_interval([summary["stockouts"] for summary in self.summaries])
+
+    def stockout_frequency(self):
+        """For each menu item that ever stocked out, the fraction of days on which it did."""
+        days_out = Counter()
+        for summary in self.summaries:
+            days_out.update(summary["items_stocked_out"].keys())
+        return {name: count / len(self.summaries) for name, count in days_out.most_common()}
+
+    def item_sales(self):
+        """For each menu item sold, its mean sales per day with their confidence interval, best sellers first."""
+        names = set()
+        for summary in self.summaries:
+            names.update(summary["items_sold"])
+        distributions = {name: confidence_interval([summary["items_sold"].get(name, 0) for summary in self.summaries])
+                         for name in names}
+        return dict(sorted(distributions.items(), key=lambda item: item[1][0], reverse=True))
+
+    def summary(self):
+        """Returns the aggregated results as a plain dict."""
+        return {
+            "days": len(self.summaries),
+            "revenue": self.revenue(),
+            "stockouts": self.stockouts(),
+            "stockout_frequency": self.stockout_frequency(),
+            "item_sales": self.item_sales(),
+        }
+
+
+def _init_worker(bar_bytes, trace_dir=None):
+    """Prepares a worker process to simulate days at the pickled bar."""
+    global _worker_bar_bytes, _worker_trace_dir
+    _worker_bar_bytes = bar_bytes
+    _worker_trace_dir = trace_dir
+    # Processes that don't share the parent's memory start with an empty catalog
+    if not ingredients.all_ingredients:
+        ingredients.load_ingredients_from_db()
+
+
+def _simulate_seeded_day(seed):
+    """Simulates one day at a fresh copy of the worker's bar, and returns its summary."""
+    bar = pickle.loads(_worker_bar_bytes)
+    bar.reload_ingredients()
+    report = simulate_day(bar, seed, trace=_worker_trace_dir is not None)
+    if report.trace is not None:
+        report.trace.save(trace_path(_worker_trace_dir, seed))
+    return report.summary()
+
+
+def trace_path(trace_dir, seed):
+    """Returns where simulate_days saves the trace of the day with the given seed."""
+    # Spawned seeds contain slashes and spaces, e.g. "0/day 3"
+    name = re.sub(r"[^\w-]+", "_", str(seed))
+    return os.path.join(trace_dir, f"day_{name}.trace")
+
+
+def simulate_days(bar, days, seed=0, workers=None, trace_dir=None):
+    """
+    Simulates many independent days at the bar across a pool of processes, to evaluate its menu and stock. Each day
+    starts from a fresh copy of the bar as it is now with its own non-overlapping random streams, so results are the
+    same for a given seed however many workers run them. The bar itself is left unchanged.
+
+    :param bar: The bar to simulate.
+    :param days: How many days to simulate.
+    :param seed: Base seed that every day's random streams are derived from.
+    :param workers: Number of worker processes. Defaults to one per CPU.
+    :param trace_dir: Optional folder to save each day's event trace to, named by trace_path.
+    :return: The MonteCarloReport for all days.
+    """
+    base_rng = SimulationRNG(seed)
+    seeds = [base_rng.spawn(f"day {day}").seed for day in range(days)]
+    bar_bytes = pickle.dumps(bar)
+    workers = workers or os.cpu_count() or 1
+    if trace_dir is not None:
+        os.makedirs(trace_dir, exist_ok=True)
+    logger.log(f"Simulating {days} days at {bar.bar_stats.bar_name} across {workers} processes...")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bar_bytes, trace_dir)) as executor:
+        # Hand out days in chunks so workers aren't waiting on the parent between short tasks
+        chunksize = max(1, days // (workers * 4))
+        summaries = list(executor.map(_simulate_seeded_day, seeds, chunksize=chunksize))
+
+    report = MonteCarloReport(summaries, seeds)
+    logger.log(f"Simulated {days} days in {time.perf_counter() - start:.2f}s: revenue {report.revenue()}")
+    return report
+# </editor-fold>
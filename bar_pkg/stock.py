@@ -1,20 +1,129 @@
-import random
 
 from rich.table import Table
 from rich.text import Text
 
 from data.ingredients import all_ingredients, list_ingredients, Ingredient, Beer, Spirit, Liqueur, separate_flavored, \
-    get_ingredient, MenuItem
+    get_ingredient, MenuItem, type_info
 from display.rich_console import console, standardized_spacing
 from interface import commands
 from recipe import Recipe
 from utility import logger
 
 
+class InventoryIndex:
+    """
+    Groups the inventory by every ingredient class each item is an instance of, and tracks the item with the most volume
+    in each class, so recipe requirements that accept any of a type can be checked without scanning the inventory.
+    """
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+        self.buckets = {}  # {class: {ingredient: None}}, ordered like the inventory
+        self.best = {}  # {class: ingredient with the highest volume in stock}, missing until worked out
+        for ingredient in inventory:
+            self.update(ingredient)
+
+    @staticmethod
+    def classes(ingredient):
+        """Returns every Ingredient class the given ingredient is an instance of."""
+        return type_info(type(ingredient)).ancestors
+
+    def update(self, ingredient, previous=0):
+        """
+        Updates the index after the ingredient's volume in the inventory has changed.
+
+        :param ingredient: The ingredient whose volume changed.
+        :param previous: Its volume before the change.
+        """
+        volume = self.inventory[ingredient]
+        for cls in self.classes(ingredient):
+            self.buckets.setdefault(cls, {})[ingredient] = None
+            if cls not in self.best:
+                continue
+            best = self.best[cls]
+            if best is ingredient:
+                # The best of this class went down, so another may now have more; work it out when next asked for
+                if volume < previous:
+                    del self.best[cls]
+            elif volume > self.inventory[best]:
+                self.best[cls] = ingredient
+
+    def of_type(self, typ):
+        """Returns the ingredients in stock of the given type, including any at zero volume, in inventory order."""
+        return self.buckets.get(typ, {}).keys()
+
+    def best_of_type(self, typ):
+        """Returns the ingredient of the given type with the highest volume in stock, or None if there are none."""
+        if typ not in self.best:
+            if not self.buckets.get(typ):
+                return None
+            self.best[typ] = max(self.buckets[typ], key=lambda item: self.inventory[item])
+        return self.best[typ]
+
+
+class ServingsCache:
+    """
+    Remembers how many servings of each menu item can be poured, along with which stocked ingredients and ingredient
+    classes each count depends on, so a change in stock only invalidates the items that use what changed.
+    """
+
+    def __init__(self):
+        self.version = 0  # Goes up with every change to the stock
+        self.entries = {}  # {menu_item: (taste signature, servings, missing ingredient messages)}
+        self.dependents = {}  # {ingredient or ingredient class: {menu items whose servings depend on it}}
+
+    def get(self, menu_item):
+        """Returns the cached (servings, missing messages) for the menu item, or None if it needs counting."""
+        entry = self.entries.get(menu_item)
+        # A recipe edited since it was counted may need different ingredients
+        if entry is None or entry[0] != menu_item.taste_signature():
+            return None
+        return entry[1], entry[2]
+
+    def store(self, menu_item, servings, missing, dependencies):
+        """
+        Caches the servings counted for a menu item.
+
+        :param dependencies: The ingredients and ingredient classes the count was made from.
+        """
+        self.entries[menu_item] = (menu_item.taste_signature(), servings, missing)
+        for dependency in dependencies:
+            self.dependents.setdefault(dependency, set()).add(menu_item)
+
+    def invalidate(self, ingredient):
+        """Drops cached counts for every menu item that uses the given ingredient, directly or by its type."""
+        self.version += 1
+        for dependency in (ingredient, *InventoryIndex.classes(ingredient)):
+            for menu_item in self.dependents.pop(dependency, ()):
+                self.entries.pop(menu_item, None)
+
+
 class BarStock:
     def __init__(self, bar):
         self.bar = bar
         self.inventory = {get_ingredient("club soda"): 24}  # Dictionary: {ingredient_object: fluid_ounces}
+        self.index = InventoryIndex(self.inventory)
+        self.servings_cache = ServingsCache()
+
+    def get_index(self):
+        """Returns the inventory index, building it for bars from older saves without one."""
+        if getattr(self, "index", None) is None or self.index.inventory is not self.inventory:
+            self.index = InventoryIndex(self.inventory)
+        return self.index
+
+    def get_servings_cache(self):
+        """Returns the cache of pourable servings, creating it for bars from older saves without one."""
+        if getattr(self, "servings_cache", None) is None:
+            self.servings_cache = ServingsCache()
+        return self.servings_cache
+
+    def set_volume(self, ingredient, volume):
+        """Sets the volume of an ingredient in stock, keeping the inventory index up to date."""
+        index = self.get_index()
+        previous = self.inventory.get(ingredient, 0)
+        self.inventory[ingredient] = volume
+        index.update(ingredient, previous)
+        self.get_servings_cache().invalidate(ingredient)
 
     def buy(self, ingredient: Ingredient = None, arg=""):
         """
@@ -49,7 +158,7 @@ class BarStock:
                 balance = self.bar.bar_stats.balance
                 if balance >= price:
                     self.bar.bar_stats.balance -= price
-                    self.inventory[ingredient] = self.inventory.get(ingredient, 0) + volume
+                    self.set_volume(ingredient, self.inventory.get(ingredient, 0) + volume)
                     return True
                 else:
                     logger.logprint(f"[error]Insufficient funds. Bar balance: [money]${balance}")
@@ -82,7 +191,7 @@ class BarStock:
                 if ingredient in self.bar.menu.get_section(ingredient):
                     continue
             lst.append(ingredient)
-            row_ings.append(Text(ingredient.name, style=typ().get_style()))
+            row_ings.append(Text(ingredient.name, style=type_info(typ).style))
             row_ings.append(ingredient.format_type())
             if len(row_ings) == 6:
                 add_tool_table.add_row(row_ings[0], row_ings[1], row_ings[2], row_ings[3], row_ings[4], row_ings[5],
@@ -105,6 +214,8 @@ class BarStock:
                 if inv_ing.name == db_ing.name:
                     new_ings[db_ing] = self.inventory[inv_ing]
         self.inventory = new_ings
+        self.index = InventoryIndex(self.inventory)
+        self.servings_cache = ServingsCache()
         logger.log("Stock reloaded.")
 
     def table_ing_category(self, table_settings, typ: type = Ingredient, showing_flavored=False, shop=False):
@@ -130,7 +241,7 @@ class BarStock:
         items = sorted(items, key=lambda x: x.name)
 
         showing_flavorable_spirit = False
-        if (isinstance(typ(), Spirit) or isinstance(typ(), Liqueur)) and typ is not Spirit:
+        if issubclass(typ, (Spirit, Liqueur)) and typ is not Spirit:
             showing_flavorable_spirit = True
 
         if not showing_flavored:  # List subclasses
@@ -139,9 +250,9 @@ class BarStock:
                 # New section for any items once there are no more categories to list
                 if items and index == len(subclasses) - 1 and not showing_flavorable_spirit:
                     end_section = True
-                obj = subclass()
-                style = obj.get_style()
-                table_1.add_row(Text(f"{obj.format_type(plural=True)} "  # Pluralize
+                info = type_info(subclass)
+                style = info.style
+                table_1.add_row(Text(f"{info.plural} "  # Pluralize
                                      f"({len(list_ingredients(container, subclass))})",  # Quantity
                                      style=style), end_section=end_section)
                 table_1.add_row()  # rich.table's leading parameter breaks end_section. Add space between rows manually
@@ -200,11 +311,7 @@ class BarStock:
 
     def list_type(self, typ, min_vol=0):
         """Lists the ingredients in stock of a specified type, with an optional minimum volume."""
-        lst = []
-        for item in self.inventory:
-            if issubclass(type(item), typ) or type(item) is typ and self.inventory[item] >= min_vol:
-                lst.append(item)
-        return lst
+        return [item for item in self.get_index().of_type(typ) if self.inventory[item] >= min_vol]
 
     def number_pourable(self, menu_item):
         """Checks ingredients in stock; returns how many servings can be poured (0 if any are missing)."""
@@ -215,35 +322,53 @@ class BarStock:
             else:
                 logger.logprint(msg)
 
+        cache = self.get_servings_cache()
+        counted = cache.get(menu_item)
+        if counted is None:
+            servings, missing, dependencies = self.count_servings(menu_item)
+            cache.store(menu_item, servings, missing, dependencies)
+        else:
+            servings, missing = counted
+            logger.trace("stock", "Can pour %s %s (unchanged)", servings, menu_item.name)
+        for msg in missing:
+            print(msg)
+        return servings
+
+    def count_servings(self, menu_item):
+        """
+        Counts how many servings of the menu item the ingredients in stock can pour.
+
+        :return: The number of servings (0 if any are missing), a list of messages for each missing ingredient, and the
+        ingredients and ingredient classes the count depends on.
+        """
+        missing = []
+        print = missing.append  # Messages are shown by number_pourable, each time it's asked
+
         if not isinstance(menu_item, Recipe):
             number_pourable = self.inventory[menu_item] // menu_item.pour_vol()
-            logger.log(f"Can pour {number_pourable} {menu_item.name}")
-            return number_pourable
+            logger.trace("stock", "Can pour %s %s", number_pourable, menu_item.name)
+            return number_pourable, missing, [menu_item]
         else:
-            logger.log(f"Checking ingredients for {menu_item.name}...")
+            logger.trace("stock", "Checking ingredients for %s...", menu_item.name)
             ing_missing = False
             max_servings = float('inf')  # Track the maximum servings across all ingredients
-            for req_ingredient, req_quantity in menu_item.r_ingredients.items():
+            # Each requirement with the amount from the recipe already resolved to fluid ounces
+            for req_ingredient, req_quantity in menu_item.get_plan().pours():
                 # If requirement is a type (accepts any ingredient of the type)
                 if isinstance(req_ingredient, type):
-                    # Find the amount from the recipe among the ingredient's possible quantities
-                    req_quantity = req_ingredient().get_portions()[req_quantity]
-                    found_match = False
                     highest_vol_match = 0
-                    # Find an ingredient in stock of the right type
-                    for inv_ingredient in self.inventory:
-                        if isinstance(inv_ingredient, req_ingredient):
-                            found_match = True
-                            available = self.inventory[inv_ingredient]
-                            servings = available // req_quantity
-                            if servings > highest_vol_match:  # Use the best match of this type
-                                highest_vol_match = servings
-                                logger.log(
-                                    f"   {inv_ingredient.name} in quantity {available} satisfies "
-                                    f"{req_ingredient().format_type()} requirement ({servings} servings)")
-                            else:
-                                logger.log(f"   {inv_ingredient.name} in quantity {available} "
-                                           f"not enough for {req_ingredient().format_type()} requirement")
+                    # Use the ingredient in stock of the right type with the most volume
+                    best_match = self.get_index().best_of_type(req_ingredient)
+                    found_match = best_match is not None
+                    if found_match:
+                        available = self.inventory[best_match]
+                        highest_vol_match = available // req_quantity
+                        if highest_vol_match > 0:
+                            logger.trace("stock", "   %s in quantity %s satisfies %s requirement (%s servings)",
+                                         best_match.name, available, type_info(req_ingredient).name, highest_vol_match)
+                        else:
+                            logger.trace("stock", "   %s in quantity %s not enough for %s requirement",
+                                         best_match.name, available, type_info(req_ingredient).name)
                     # If no ingredients found with enough volume to pour, there is an ingredient missing for the recipe
                     if found_match and highest_vol_match > 0:
                         max_servings = min(max_servings, highest_vol_match)
@@ -252,31 +377,29 @@ class BarStock:
                             ing_missing = True
                             print(f"[error]Ingredients missing for {menu_item.name}:[/error]")
                         if found_match:
-                            print(f"[error] Not enough {req_ingredient().format_type()}![/error]")
+                            print(f"[error] Not enough {type_info(req_ingredient).name}![/error]")
                         else:
-                            print(f"[error] No {req_ingredient().format_type()}!")
+                            print(f"[error] No {type_info(req_ingredient).name}!")
                         # Continue looping so all missing ingredients are printed
 
                 else:  # Specific ingredient required
                     # Club soda is infinite
                     if req_ingredient.name == "club soda":
                         continue
-                    req_quantity = req_ingredient.get_portions()[req_quantity]
                     # Check that the ingredient is in inventory with enough volume
                     if req_ingredient in self.inventory:
                         available = self.inventory[req_ingredient]
                         servings = available // req_quantity
                         if servings > 0:
-                            logger.log(f"   {req_ingredient.name} in quantity {available} "
-                                       f"satisfies requirement ({servings} servings)")
+                            logger.trace("stock", "   %s in quantity %s satisfies requirement (%s servings)",
+                                         req_ingredient.name, available, servings)
                             max_servings = min(max_servings, servings)
                         else:
                             if not ing_missing:
                                 ing_missing = True
                                 print(f"[error]Ingredients missing for {menu_item.name}:")
-                            logger.log(
-                                f"{req_ingredient.name} in quantity {available} "
-                                f"not enough to satisfy requirement of {req_quantity}")
+                            logger.trace("stock", "%s in quantity %s not enough to satisfy requirement of %s",
+                                         req_ingredient.name, available, req_quantity)
                             print(f"[error] Not enough {req_ingredient.name}![/error]")
                     else:
                         if not ing_missing:
@@ -284,12 +407,13 @@ class BarStock:
                             print(f"[error]Ingredients missing for {menu_item.name}:[/error]")
                         print(f"[error] No {req_ingredient.name}![/error]")
                     # Add quantity check if needed
+            dependencies = list(menu_item.r_ingredients)
             if ing_missing:
-                return 0
+                return 0, missing, dependencies
             else:
                 number_pourable = max_servings if max_servings != float('inf') else 0
-                logger.log(f"Can pour {number_pourable} {menu_item.name}")
-                return number_pourable
+                logger.trace("stock", "Can pour %s %s", number_pourable, menu_item.name)
+                return number_pourable, missing, dependencies
 
     def has_enough(self, menu_item: MenuItem):
         """Checks whether inventory is sufficient to pour a single MenuItem, whether single ingredient or recipe."""
@@ -311,39 +435,86 @@ class BarStock:
         :param randoms: Set to True to choose a random ingredient from the stock.
         """
         final_ings = dict()
-        for r_ingredient in recipe.r_ingredients:
+        for r_ingredient, vol in recipe.get_plan().pours():
             if isinstance(r_ingredient, type):
-                vol = r_ingredient().get_portions()[recipe.r_ingredients[r_ingredient]]
                 if randoms:
-                    final_ings[random.choice(self.list_type(r_ingredient, min_vol=vol))] = vol
+                    rng = self.bar.occupancy.get_rng().ingredients
+                    final_ings[rng.choice(self.list_type(r_ingredient, min_vol=vol))] = vol
                 else:
-                    logger.log(f"Selecting {r_ingredient().format_type()}...")
+                    logger.log(f"Selecting {type_info(r_ingredient).name}...")
                     available_ings = self.list_type(r_ingredient, min_vol=vol)
                     options_str = [ing.name for ing in available_ings]
                     console.print(f"  {options_str}")
                     logger.log(f"  {options_str}")
-                    cmd = commands.input_loop(f"Select {r_ingredient().format_type()}",
+                    cmd = commands.input_loop(f"Select {type_info(r_ingredient).name}",
                                               commands.items_to_commands(available_ings))[0]
                     item = commands.command_to_item(cmd, available_ings)
                     final_ings[item] = vol
             else:
-                vol = r_ingredient.get_portions()[recipe.r_ingredients[r_ingredient]]
                 final_ings[r_ingredient] = vol
         return final_ings
 
-    def pour(self, menu_item: MenuItem):
-        """Removes ingredients from the stock in proper portions, initiating ingredient selection where applicable."""
+    def reserve(self, menu_item: MenuItem, reserved):
+        """
+        Works out the ingredients and volumes to pour one menu item from what's left in stock after earlier reservations,
+        choosing randomly among ingredients that satisfy a requirement for any of a type.
+
+        :param menu_item: The menu item to pour.
+        :param reserved: {ingredient: volume} already set aside for other orders, added to if this one can be poured.
+        :return: A dict of {ingredient: volume} to pour, or None if the stock can't cover it.
+        """
+        needed = {}
+
+        def available(ingredient):
+            return self.inventory.get(ingredient, 0) - reserved.get(ingredient, 0) - needed.get(ingredient, 0)
+
         if isinstance(menu_item, Recipe):
-            provided_ings = self.select_ingredients(menu_item, randoms=True)
-            for ingredient in provided_ings:
-                vol = provided_ings[ingredient]
-                msg = f"   [dimmed]Pouring {vol} of {ingredient.format_name()}[/dimmed]"
-                if ingredient.name != "club soda":
-                    self.inventory[ingredient] -= vol
-                    msg = msg + f"[dimmed]- stock now at {self.inventory[ingredient]}[/dimmed]"
-                logger.log(msg)
+            for r_ingredient, vol in menu_item.get_plan().pours():
+                if isinstance(r_ingredient, type):
+                    options = [item for item in self.get_index().of_type(r_ingredient) if available(item) >= vol]
+                    if not options:
+                        return None
+                    ingredient = self.bar.occupancy.get_rng().ingredients.choice(options)
+                else:
+                    ingredient = r_ingredient
+                    # Club soda is infinite
+                    if ingredient.name != "club soda" and available(ingredient) < vol:
+                        return None
+                needed[ingredient] = needed.get(ingredient, 0) + vol
         else:
-            self.inventory[menu_item] -= menu_item.pour_vol()
-            msg = f"    [dimmed]Pouring {menu_item.pour_vol()} of {menu_item.format_name()} - stock now at {self.inventory[menu_item]}[/dimmed]"
+            if available(menu_item) < menu_item.pour_vol():
+                return None
+            needed[menu_item] = menu_item.pour_vol()
 
-            logger.log(msg)
+        for ingredient, vol in needed.items():
+            reserved[ingredient] = reserved.get(ingredient, 0) + vol
+        return needed
+
+    def fulfil(self, orders, poured_volumes=None):
+        """
+        Pours a whole round of orders at once. Every order is checked against the stock left after the ones before it,
+        so two orders can't both take the last pour of a bottle, and the stock is only changed once all are decided.
+
+        :param orders: The menu items ordered, in the order they were placed.
+        :param poured_volumes: Optional list that each order's {ingredient: volume} poured is appended to, or None
+                               for orders that couldn't be poured.
+        :return: A list with True for each order that was poured, or False if the stock ran out for it.
+        """
+        reserved = {}
+        poured = []
+        for menu_item in orders:
+            pours = self.reserve(menu_item, reserved)
+            poured.append(pours is not None)
+            if poured_volumes is not None:
+                poured_volumes.append(pours)
+            if pours is None:
+                logger.log(f"   Not enough in stock to pour {menu_item.name}")
+                continue
+            for ingredient, vol in pours.items():
+                logger.trace("stock", "   [dimmed]Pouring %s of %s[/dimmed]", vol, ingredient.name)
+
+        for ingredient, vol in reserved.items():
+            if ingredient.name != "club soda":
+                self.set_volume(ingredient, self.inventory[ingredient] - vol)
+                logger.trace("stock", "   [dimmed]%s stock now at %s[/dimmed]", ingredient.name, self.inventory[ingredient])
+        return poured
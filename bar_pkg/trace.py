@@ -0,0 +1,165 @@
+import struct
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; traces load into array.array columns without it
+    np = None
+
+# Kinds of traced event
+ARRIVAL, ORDER, SALE, STOCKOUT, COMMENT, DEPARTURE, POUR, PRICE_CHANGE = range(8)
+kind_names = ("arrival", "order", "sale", "stockout", "comment", "departure", "pour", "price change")
+
+# File layout, all little-endian: a header, then each column's values back to back, then the string table
+magic = b"TVTR"
+version = 2
+header_format = struct.Struct("<4sBIIi")  # Magic, version, event count, string count, seed string id
+# Byte length before each string, by file version. Version 1 cut strings to 16-bit lengths, which could split a character
+string_length_formats = {1: struct.Struct("<H"), 2: struct.Struct("<I")}
+# (name, array typecode) of each column, in file order
+columns = (("kinds", "B"), ("times", "i"), ("groups", "i"), ("customers", "i"), ("items", "i"), ("amounts", "d"))
+
+
+class EventTrace:
+    """
+    Typed record of everything that happens over a simulated day, kept as one compact array per field instead of as
+    log text. Names and comments are stored once in a string table and referred to by id; fields that don't apply to an
+    event are -1.
+
+    Amounts are the sale or menu price for orders, sales, stockouts and price changes, fluid ounces for pours, and the
+    headcount for arrivals and departures.
+
+    Prices can only be marked up or down from the menu screen, never while a day is being simulated, so the price
+    changes in a day's trace are each menu item's price at opening.
+    """
+
+    def __init__(self, seed=None):
+        self.kinds = array("B")
+        self.times = array("i")
+        self.groups = array("i")
+        self.customers = array("i")
+        self.items = array("i")
+        self.amounts = array("d")
+        self.strings = []
+        self.string_ids = {}  # {string: id in self.strings}
+        self.seed_id = -1 if seed is None else self.string_id(str(seed))
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def string_id(self, string):
+        """Returns the id of the string in the string table, adding it if it's new."""
+        string_id = self.string_ids.get(string)
+        if string_id is None:
+            string_id = self.string_ids[string] = len(self.strings)
+            self.strings.append(string)
+        return string_id
+
+    def record(self, kind, game_time, group=None, customer=None, item=None, amount=0):
+        """
+        Appends an event.
+
+        :param kind: One of the event kinds, e.g. SALE.
+        :param group: The customer group's id.
+        :param customer: The customer's name.
+        :param item: The menu item or ingredient name, or the text of a comment.
+        :param amount: The event's price, volume or headcount.
+        """
+        self.kinds.append(kind)
+        self.times.append(game_time)
+        self.groups.append(-1 if group is None else group)
+        self.customers.append(-1 if customer is None else self.string_id(customer))
+        self.items.append(-1 if item is None else self.string_id(item))
+        self.amounts.append(float(amount))
+
+    def record_customer(self, kind, game_time, cstmr, item=None, amount=0):
+        """Appends an event for one customer, filling in their group."""
+        group = getattr(cstmr, "group", None)
+        self.record(kind, game_time, group.group_id if group else None, cstmr.name, item, amount)
+
+    def save(self, path):
+        """Writes the trace to a binary file that load_trace reads."""
+        with open(path, "wb") as file:
+            file.write(header_format.pack(magic, version, len(self), len(self.strings), self.seed_id))
+            for name, typecode in columns:
+                column = getattr(self, name)
+                if sys.byteorder == "big":
+                    column = array(typecode, column)
+                    column.byteswap()
+                file.write(column.tobytes())
+            string_length_format = string_length_formats[version]
+            for string in self.strings:
+                encoded = string.encode("utf-8")
+                file.write(string_length_format.pack(len(encoded)))
+                file.write(encoded)
+
+
+class DayTrace:
+    """A day's trace loaded back from file, with each field as an array (NumPy, if installed) of one value per event."""
+
+    def __init__(self, columns_by_name, strings, seed):
+        self.kinds = columns_by_name["kinds"]
+        self.times = columns_by_name["times"]
+        self.groups = columns_by_name["groups"]
+        self.customers = columns_by_name["customers"]
+        self.items = columns_by_name["items"]
+        self.amounts = columns_by_name["amounts"]
+        self.strings = strings
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def name(self, string_id):
+        """Returns the string for a customers or items value, or None for -1."""
+        return None if string_id < 0 else self.strings[string_id]
+
+    def of_kind(self, kind):
+        """Returns the indexes of every event of the given kind."""
+        if np is not None:
+            return np.flatnonzero(self.kinds == kind)
+        return [index for index, event_kind in enumerate(self.kinds) if event_kind == kind]
+
+    def events(self, kind=None):
+        """Yields each event (optionally of one kind) as a readable tuple of (kind name, time, group, customer, item, amount)."""
+        indexes = range(len(self)) if kind is None else self.of_kind(kind)
+        for index in indexes:
+            yield (kind_names[self.kinds[index]], int(self.times[index]), int(self.groups[index]),
+                   self.name(self.customers[index]), self.name(self.items[index]), float(self.amounts[index]))
+
+
+def load_trace(path):
+    """
+    Reads a trace written by EventTrace.save, in this or any earlier version of the file layout.
+
+    :return: The DayTrace.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    file_magic, file_version, count, string_count, seed_id = header_format.unpack_from(data)
+    if file_magic != magic or file_version not in string_length_formats:
+        raise ValueError(f"{path} is not an event trace of version {version} or earlier")
+    string_length_format = string_length_formats[file_version]
+
+    offset = header_format.size
+    columns_by_name = {}
+    for name, typecode in columns:
+        size = array(typecode).itemsize * count
+        if np is not None:
+            column = np.frombuffer(data, dtype=np.dtype(typecode).newbyteorder("<"), count=count, offset=offset)
+        else:
+            column = array(typecode)
+            column.frombytes(data[offset:offset + size])
+            if sys.byteorder == "big":
+                column.byteswap()
+        columns_by_name[name] = column
+        offset += size
+
+    strings = []
+    for _ in range(string_count):
+        (length,) = string_length_format.unpack_from(data, offset)
+        offset += string_length_format.size
+        strings.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+    return DayTrace(columns_by_name, strings, strings[seed_id] if seed_id >= 0 else None)
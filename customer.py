@@ -1,4 +1,3 @@
-import random
 from decimal import Decimal
 from typing import Iterable
 
@@ -6,6 +5,7 @@ from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
 
+import customer_scoring
 from data import flavors, ingredients
 from data.db_connect import get_connection, close_connection
 from data.ingredients import list_ingredients, get_ingredient
@@ -57,10 +57,11 @@ class Customer:
 
     def generate_customer_data(self):
         tag_field = None
+        rng = self.bar.occupancy.get_rng().customers
 
         def select_name():
             # TODO: Ensure names arent used twice
-            name = utils.roll_probabilities(customer_names.keys())
+            name = utils.roll_probabilities(customer_names.keys(), rng)
             dict = customer_names[name]
             customer_names.pop(name)
             nonlocal tag_field
@@ -87,15 +88,15 @@ class Customer:
             elif self.gender == "fem":
                 probabilities[ingredients.Wine] += prob_points["women order wine"]
                 probabilities[ingredients.Beer] += prob_points["women order beer"]
-            self.drink_pref = utils.roll_probabilities(probabilities)
+            self.drink_pref = utils.roll_probabilities(probabilities, rng)
 
         def generate_fav_spirit():
             self.fav_spirit = utils.roll_probabilities(
-                [ingredients.Vodka, ingredients.Whiskey, ingredients.Gin, ingredients.Tequila, ingredients.Rum])
+                [ingredients.Vodka, ingredients.Whiskey, ingredients.Gin, ingredients.Tequila, ingredients.Rum], rng)
 
         def generate_fav_tastes():
             for i in range(5):
-                self.fav_tastes.add(utils.roll_probabilities(flavors.tastes.keys()))
+                self.fav_tastes.add(utils.roll_probabilities(flavors.tastes.keys(), rng))
 
         def generate_fav_ingreds():
             faves = set()
@@ -105,12 +106,13 @@ class Customer:
                     list_ingredients(typ=ingredients.Tea) + list_ingredients(typ=ingredients.Absinthe) +
                     [get_ingredient("Coca-Cola"), get_ingredient("Sprite")])
             for i in range(10):
-                ingredient = utils.roll_probabilities(possible_ingreds)
+                ingredient = utils.roll_probabilities(possible_ingreds, rng)
                 faves.add(ingredient)
             self.fav_ingreds = faves
 
         def generate_fav_keywords():
-            words = set(random.choices(list(flavors.keywords), k=5))
+            # Sorted, since a set of strings iterates in a different order in each process
+            words = set(rng.choices(sorted(flavors.keywords), k=5))
             self.fav_keywords = words
 
         select_name()
@@ -126,26 +128,35 @@ class Customer:
     def format_name(self):
         return f"[cstmr]{self.name}[/cstmr]"
 
+    def dialogue_rng(self):
+        """Returns the random stream for picking what this customer says."""
+        return self.bar.occupancy.get_rng().dialogue
+
     def score_flavors(self, game_time, drink: ingredients.MenuItem, drinking=False):
         # TODO: Score with the ingredients they chose
-        logger.log(f"{self.name} scoring {drink.name}:")
+        logger.trace("customer", "%s scoring %s:", self.name, drink.name)
         points = Decimal(0)
+        speech = self.dialogue_rng()
 
         cost_points = round(Decimal(drink.cost_value()[0] * 8), 2)
         points += cost_points
-        logger.log(f"   {cost_points} points from cost value")
+        logger.trace("customer", "   %s points from cost value", cost_points)
 
         if isinstance(drink, self.drink_pref):
             points += 50
-            logger.log("    50 points from preferred drink type")
-
-        for taste in self.fav_tastes:
-            if drink.has_flavor_in_top_n(taste, 5):
-                taste_points = drink.taste_profile[taste] * 5
+            logger.trace("customer", "    50 points from preferred drink type")
+
+        # The same cached profile customer_scoring reads, so batch and per-drink scores agree
+        top_tastes = drink.top_flavors(5)
+        # Sorted, since a set of strings iterates in a different order in each process, and each line said draws
+        # from the dialogue stream
+        for taste in sorted(self.fav_tastes):
+            if taste in top_tastes:
+                taste_points = top_tastes[taste] * 5
                 points += taste_points
-                logger.log(f"   {taste_points} points from favorite taste {taste}")
+                logger.trace("customer", "   %s points from favorite taste %s", taste_points, taste)
                 if drinking and taste_points > 25 and not self.is_revealed(taste):
-                    self.say(game_time, random.choice([f"I'm a big fan of the {taste} flavor in the {drink.name}.",
+                    self.say(game_time, speech.choice([f"I'm a big fan of the {taste} flavor in the {drink.name}.",
                                                        f"I love when drinks taste {taste}.",
                                                        f"It's {taste}... I like it.", f"Very {taste}. I'm interested.",
                                                        f"This {drink.name} tastes nicely {taste}.",
@@ -163,28 +174,28 @@ class Customer:
         if isinstance(drink, Recipe):
             for ingredient in drink.r_ingredients:
                 if isinstance(ingredient, self.fav_spirit):
-                    logger.log("    50 points from favorite spirit")
+                    logger.trace("customer", "    50 points from favorite spirit")
                     points += 50
-                    if drinking and not self.is_revealed(spirit):
-                        spirit = self.fav_spirit().format_type()
+                    if drinking and not self.is_revealed(self.fav_spirit):
+                        spirit = ingredients.type_info(self.fav_spirit).name
                         self.say(game_time,
-                                 random.choice([f"{spirit} is calling my name!", f"{spirit} cocktails are the best!",
+                                 speech.choice([f"{spirit} is calling my name!", f"{spirit} cocktails are the best!",
                                                 f"Uh oh... {spirit} is my weakness.",
                                                 f"I'll always say yes to {spirit}.",
                                                 f"Oh, {spirit}... What would I do without you?",
                                                 f"Awesome, {spirit} is my weapon of choice.",
                                                 f"I love a good {spirit} cocktail.",
                                                 f"Oooh, you have {spirit} cocktails!"]))
-                        self.reveal_fav(spirit)
+                        self.reveal_fav(self.fav_spirit)
 
                 if ingredient in self.fav_ingreds:
-                    logger.log(f"   80 points from favorite ingredient {ingredient.name}")
+                    logger.trace("customer", "   80 points from favorite ingredient %s", ingredient.name)
                     points += 80
                     if drinking and not self.is_revealed(ingredient):
                         self.reveal_fav(ingredient)
                         if ingredient.name not in {"lime", "lemon"}:
                             self.say(game_time,
-                                     random.choice([f"Oh man, they've got {ingredient.name} in the {drink.name}!",
+                                     speech.choice([f"Oh man, they've got {ingredient.name} in the {drink.name}!",
                                                     f"Oooh, {ingredient.name} is my favorite.",
                                                     f"I love cocktails with {ingredient.name}.",
                                                     f"Oh, hey, I love {ingredient.name}!",
@@ -194,10 +205,20 @@ class Customer:
                                                     f"Aw, {ingredient.name}! I love {ingredient.name}.",
                                                     f"{ingredient.name.capitalize()} cocktail? My lucky day!"]))
 
-        logger.log(f"{points} points total")
+        logger.trace("customer", "%s points total", points)
         return points
 
-    def order(self, bar, game_time, exclude=None):
+    def choose_order(self, bar, game_time, exclude=None, precomputed_scores=None):
+        """
+        Chooses a drink from the bar's menu based on this customer's preferences, without buying it.
+
+        :param bar: The bar being ordered from.
+        :param game_time: The current in-game time.
+        :param exclude: Menu items already found to be out of stock this order.
+        :param precomputed_scores: Optional {menu_item: score} from a batch scoring of the round, used in place of
+        score_flavors for each candidate.
+        :return: The chosen menu item, or None if there was nothing left to order and the customer's group has left.
+        """
 
         def order_type_probabilities():
             probs = {}
@@ -229,11 +250,15 @@ class Customer:
         def favorite_of_list(list):
             scores = {}
             for menu_item in list:
-                scores[menu_item] = self.score_flavors(game_time, menu_item)
-            return utils.roll_probabilities(scores)
+                if precomputed_scores is not None and menu_item in precomputed_scores:
+                    scores[menu_item] = precomputed_scores[menu_item]
+                else:
+                    scores[menu_item] = self.score_flavors(game_time, menu_item)
+            # Picks evenly among the scored items, as it always has, so batch scores can't change what's ordered
+            return utils.roll_probabilities([*scores], ordering)
 
         def no_drinks():
-            self.say(game_time, random.choice([
+            self.say(game_time, speech.choice([
                 "Fine, I'm out of here.",
                 "Damn, seriously?",
                 "How does a bar run out of drinks?",
@@ -245,14 +270,16 @@ class Customer:
         if not exclude:
             exclude = set()
         bar.occupancy.customer_displayed = self
+        ordering = bar.occupancy.get_rng().ordering
+        speech = self.dialogue_rng()
 
-        typ = self.drink_pref().format_type().lower()
-        typs = self.drink_pref().format_type(plural=True).lower()
+        typ = ingredients.type_info(self.drink_pref).name.lower()
+        typs = ingredients.type_info(self.drink_pref).plural.lower()
         # If their favorite type of drink is on the menu
         if len(bar.menu.get_section(self.drink_pref)) > 0:
             # If there's not many of that type of drink on the menu, and this customer hasn't already commented on this
             if len(bar.menu.get_section(self.drink_pref)) < 4 and f"no {typs}" not in self.comments_made:
-                self.say(game_time, msg=random.choice([f"There's not a lot of {typs}...",
+                self.say(game_time, msg=speech.choice([f"There's not a lot of {typs}...",
                                                        f"I was thinking there would be more {typs}...",
                                                        f"They don't have much of a {typ} selection...",
                                                        f"Well, at least there's a couple {typs}...",
@@ -262,10 +289,10 @@ class Customer:
                 self.comments_made.add(f"no {typs}")
 
             # Roll for whether they order their favorite kind of drink, or branch out
-            ordering_pref_drink = utils.roll_probabilities(ratio_chances["order preferred drink type"])
+            ordering_pref_drink = utils.roll_probabilities(ratio_chances["order preferred drink type"], ordering)
         else: # If the bar doesn't have their favorite type of drink
-            if f"not many {typs}" not in self.comments_made and random.randint(1, 3) == 1:
-                self.say(game_time, msg=random.choice([f"Wish I could have a {typ}.", f"I could really go for a {typ}.",
+            if f"not many {typs}" not in self.comments_made and speech.randint(1, 3) == 1:
+                self.say(game_time, msg=speech.choice([f"Wish I could have a {typ}.", f"I could really go for a {typ}.",
                                                        f"Aw, they don't have any {typs}.",
                                                        f"Let's go somewhere with {typ} next.",
                                                        f"I'd be happier with a {typ} in my hand.",
@@ -281,24 +308,26 @@ class Customer:
             for excluded_item in exclude:
                 if excluded_item in  available_menu:
                     available_menu.remove(excluded_item)
+                    bar.menu.menu_changed()
             # If there are none left of their favorite drink type, proceed to order from another drink type
             if len(available_menu) < 1:
                 ordering_pref_drink = False
             else:
                 # Roll to determine which of their favorite type of drink to order
-                order = utils.roll_probabilities(available_menu)
+                order = utils.roll_probabilities(available_menu, ordering)
 
         if not ordering_pref_drink: # If not ordering favorite drink type
             # Choose a type of drink from the menu based on preferences
-            order_typ = utils.roll_probabilities(utils.percentize(order_type_probabilities()))
+            order_typ = utils.roll_probabilities(utils.percentize(order_type_probabilities()), ordering)
             if not order_typ:
                 no_drinks()
-                return
+                return None
             # Choose a drink from the type of drink they want
             section = bar.menu.get_section(order_typ)
             for excluded_item in exclude:
                 if excluded_item in section:
                     section.remove(excluded_item)
+                    bar.menu.menu_changed()
             if section: # If there's at least one of their chosen type of drink
                 order = favorite_of_list(section)
             else: # If there's none of their chosen type of drink, just find something to drink
@@ -308,31 +337,42 @@ class Customer:
                     order = favorite_of_list(full_menu)
                 else: # There's no drinks left in the bar
                     no_drinks()
-                    return
+                    return None
 
-        # Order decided. Try to make the sale
+        if bar.occupancy.active_report():
+            bar.occupancy.active_report().record_order(game_time, self, order)
+        return order
+
+    def receive_order(self, bar, game_time, order):
+        """Announces and records a drink this customer has bought, and has them taste it."""
+        style = order.get_style()
+        bar.occupancy.print_msg(game_time=game_time,
+                                msg=f"{self.format_name()} orders {utils.format_a(order.name)} "
+                                    f"[{style}]{order.name}[/{style}]. "
+                                    f"[money](+${"{:.2f}".format(order.current_price())})[/money]")
+        self.order_history.append(order)
+        if bar.occupancy.active_report():
+            bar.occupancy.active_report().record_sale(game_time, self, order, order.current_price())
+        self.score_flavors(game_time, order, drinking=True)
+
+    def missed_order(self, bar, game_time, order):
+        """Announces and records a drink this customer tried to order after it ran out."""
         style = order.get_style()
-        # If the drink hasn't run out
-        if bar.make_sale(order):
-            bar.occupancy.print_msg(game_time=game_time,
-                                    msg=f"{self.format_name()} orders {utils.format_a(order.name)} "
-                                        f"[{style}]{order.name}[/{style}]. "
-                                        f"[money](+${"{:.2f}".format(order.current_price())})[/money]")
-            self.order_history.append(order)
-            self.score_flavors(game_time, order, drinking=True)
-        else: # Drink has run out
-            # Try to order again with this drink excluded
-            bar.occupancy.print_msg(game_time=game_time, msg=f"{self.format_name()} tried to order "
-                                                             f"{utils.format_a(order.name)} "
-                                                             f"[{style}]{order.name}[/{style}], but you've run out!")
-            exclude.add(order)
-            self.order(bar, game_time, exclude)
+        bar.occupancy.print_msg(game_time=game_time, msg=f"{self.format_name()} tried to order "
+                                                         f"{utils.format_a(order.name)} "
+                                                         f"[{style}]{order.name}[/{style}], but you've run out!")
+        if bar.occupancy.active_report():
+            bar.occupancy.active_report().record_stockout(game_time, self, order)
 
     def say(self, game_time, msg):
         self.bar.occupancy.print_msg(game_time=game_time, msg=f"[dimmed]{self.name}: {msg}[/dimmed]")
+        if self.bar.occupancy.active_report():
+            self.bar.occupancy.active_report().record_comment(game_time, self, msg)
 
     def is_revealed(self, pref):
-        if isinstance(pref, type):
+        if pref == self.fav_spirit:  # A spirit class, checked before other classes like reveal_fav does
+            return self.revealed_favs["Favorite spirit"] == pref
+        elif isinstance(pref, type):
             if self.revealed_favs["Preferred drink type"] is None:
                 return False
             elif self.revealed_favs["Preferred drink type"] == pref:
@@ -375,6 +415,12 @@ class Customer:
         elif pref in self.fav_keywords:
             self.revealed_favs["Favorite keywords"].add(pref)
 
+    def panel_signature(self):
+        """Returns a summary of everything customer_panel shows that can change, to tell when it needs redrawing."""
+        # Revealed favorites are only ever added, so set sizes are enough to tell them apart
+        return (self.times_visited, len(self.order_history),
+                *(len(revealed) if isinstance(revealed, set) else revealed for revealed in self.revealed_favs.values()))
+
     def customer_panel(self):
 
         unknown_text = Text("Unknown", style=console.get_style("dimmed"))
@@ -398,8 +444,8 @@ class Customer:
                 if self.revealed_favs[fav_name] is None:
                     text = unknown_text
                 else:
-                    style = attribute().format_type()
-                    text = Text(attribute, style=console.get_style(style))
+                    info = ingredients.type_info(attribute)
+                    text = Text(info.name, style=console.get_style(info.style))
 
             table.add_row(f"{fav_name}:", text)
             table.add_row()
@@ -434,8 +480,35 @@ class CustomerGroup:
         self.last_round = None
 
     def order_round(self, bar, game_time):
-        for customer in self.customers:
-            customer.order(bar, game_time)
+        """
+        Has every member choose a drink, then pours the whole round at once. Anyone whose drink ran out chooses again
+        with it excluded, until everyone has a drink or there's nothing left for them.
+        """
+        # Score the whole menu for every member at once; falls back to per-drink scoring without NumPy
+        scores = customer_scoring.round_scores(self.customers, bar.menu.list_full_menu())
+        excluded = {customer: set() for customer in self.customers}
+        waiting = list(self.customers)
+        while waiting:
+            orders = []
+            for customer in waiting:
+                order = customer.choose_order(bar, game_time, excluded[customer],
+                                              precomputed_scores=scores.get(customer) if scores else None)
+                if order is not None:
+                    orders.append((customer, order))
+
+            # What was poured for each order is only kept when a simulated day is being recorded
+            pours = [] if bar.occupancy.active_report() else None
+            poured = bar.fulfil_round([order for customer, order in orders], pours)
+            waiting = []
+            for i, ((customer, order), success) in enumerate(zip(orders, poured)):
+                if success:
+                    if pours is not None:
+                        bar.occupancy.active_report().record_pours(game_time, customer, pours[i])
+                    customer.receive_order(bar, game_time, order)
+                else:
+                    customer.missed_order(bar, game_time, order)
+                    excluded[customer].add(order)
+                    waiting.append(customer)
 
     def leave(self, bar, game_time):
         log_msg = ""
@@ -460,6 +533,8 @@ class CustomerGroup:
             log_msg = f"{next(iter(self.customers)).format_name()} leaves the bar."
 
         bar.occupancy.print_msg(log_msg, game_time)
+        if bar.occupancy.active_report():
+            bar.occupancy.active_report().record_departure(game_time, self)
         bar.bar_stats.past_customers[self.group_id] = self
         if self in bar.occupancy.current_customer_groups:
             bar.occupancy.current_customer_groups.remove(self)
@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+from data.taste_matrix import catalog_matrix, taste_columns, taste_column_index
+from recipe import Recipe
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; Customer.score_flavors scores one drink at a time without it
+    np = None
+
+
+def score_matrix(customers, menu_items):
+    """
+    Scores every menu item for every customer with the same point rules as Customer.score_flavors - cost, preferred
+    drink type, favorite tastes, favorite spirit and favorite ingredients - without its logging or dialogue.
+
+    :param customers: Sequence of customers to score for
+    :param menu_items: Sequence of menu items (ingredients or recipes) to score
+    :return: A float32 array of shape (customers, menu items)
+    """
+    matrix = catalog_matrix()
+    if matrix is None:
+        raise ImportError("NumPy is required for batch customer scoring")
+    # Favorite ingredients are encoded by matrix row, so the rows must be laid out for the current catalog
+    matrix.check_revision()
+
+    # Columns for the preferences actually held by this block of customers
+    pref_types = list(dict.fromkeys(cstmr.drink_pref for cstmr in customers))
+    spirits = list(dict.fromkeys(cstmr.fav_spirit for cstmr in customers))
+    pref_column = {typ: column for column, typ in enumerate(pref_types)}
+    spirit_column = {typ: column for column, typ in enumerate(spirits)}
+
+    # <editor-fold desc="Customer encodings">
+    pref_onehot = np.zeros((len(customers), len(pref_types)), dtype=np.float32)
+    spirit_onehot = np.zeros((len(customers), len(spirits)), dtype=np.float32)
+    taste_onehot = np.zeros((len(customers), len(taste_columns)), dtype=np.float32)
+    ingredient_onehot = np.zeros((len(customers), len(matrix.ingredients)), dtype=np.float32)
+    for row, cstmr in enumerate(customers):
+        pref_onehot[row, pref_column[cstmr.drink_pref]] = 1
+        spirit_onehot[row, spirit_column[cstmr.fav_spirit]] = 1
+        for taste in cstmr.fav_tastes:
+            taste_onehot[row, taste_column_index[taste]] = 1
+        for ingredient in cstmr.fav_ingreds:
+            if ingredient in matrix.row_index:
+                ingredient_onehot[row, matrix.row_index[ingredient]] = 1
+    # </editor-fold>
+
+    # <editor-fold desc="Menu item encodings">
+    cost_points = np.zeros(len(menu_items), dtype=np.float32)
+    item_types = np.zeros((len(menu_items), len(pref_types)), dtype=np.float32)
+    item_spirits = np.zeros((len(menu_items), len(spirits)), dtype=np.float32)
+    item_ingredients = np.zeros((len(menu_items), len(matrix.ingredients)), dtype=np.float32)
+    for row, item in enumerate(menu_items):
+        cost_points[row] = float(round(Decimal(item.cost_value()[0] * 8), 2))
+        for typ, column in pref_column.items():
+            if isinstance(item, typ):
+                item_types[row, column] = 1
+        if isinstance(item, Recipe):
+            for r_ingredient in item.r_ingredients:
+                # Type requirements don't count towards favorites until a specific ingredient is poured
+                if isinstance(r_ingredient, type):
+                    continue
+                for typ, column in spirit_column.items():
+                    if isinstance(r_ingredient, typ):
+                        item_spirits[row, column] += 1
+                if r_ingredient in matrix.row_index:
+                    item_ingredients[row, matrix.row_index[r_ingredient]] += 1
+
+    # Favorite tastes only score when they are in the drink's top 5. Taken from each item's cached profile, as
+    # score_flavors does, so ties for 5th place are broken the same way and recipe scores match it exactly
+    item_taste_points = np.zeros((len(menu_items), len(taste_columns)), dtype=np.float32)
+    for row, item in enumerate(menu_items):
+        for taste, points in item.top_flavors(5).items():
+            item_taste_points[row, taste_column_index[taste]] = float(points) * 5
+    # </editor-fold>
+
+    return (cost_points[None, :]
+            + 50 * (pref_onehot @ item_types.T)
+            + taste_onehot @ item_taste_points.T
+            + 50 * (spirit_onehot @ item_spirits.T)
+            + 80 * (ingredient_onehot @ item_ingredients.T))
+
+
+def round_scores(customers, menu_items):
+    """
+    Scores a round of orders in one batch, for use in place of per-item calls to Customer.score_flavors.
+
+    :return: A dict of {customer: {menu_item: float score}}, or None if NumPy is not installed or there is nothing
+    to score.
+    """
+    if np is None or not customers or not menu_items or catalog_matrix() is None:
+        return None
+    customers = list(customers)
+    scores = score_matrix(customers, menu_items)
+    return {cstmr: {item: round(float(scores[row, column]), 2) for column, item in enumerate(menu_items)}
+            for row, cstmr in enumerate(customers)}
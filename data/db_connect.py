@@ -1,3 +1,4 @@
+import os
 import sqlite3
 from importlib import resources
 
@@ -11,3 +12,9 @@ def get_connection():
 
 def close_connection(conn):
     conn.close()
+
+
+def get_catalog_path():
+    """Returns the path of the compiled ingredient catalog, stored alongside the database file."""
+    with resources.path("data", "tavern_db.db") as db_path:
+        return os.path.join(os.path.dirname(str(db_path)), "tavern_catalog.pickle")
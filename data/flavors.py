@@ -1,3 +1,5 @@
+from collections import deque
+
 from data.db_connect import get_connection, close_connection
 
 # TODO: Taste profiles as percents
@@ -20,6 +22,62 @@ tastes["tart"].update(tastes["citrusy"])
 tastes["savory"].update(tastes["vegetal"])
 tastes["smooth"].update(tastes["creamy"])
 
+
+class TermIndex:
+    """
+    Aho-Corasick automaton over every taste term, so a descriptor string can be matched against the whole taste
+    vocabulary in a single scan instead of one substring check per term.
+    """
+
+    def __init__(self, taste_terms):
+        self.taste_order = {taste: index for index, taste in enumerate(taste_terms)}
+        self.tastes_by_term = {}  # {term: [(taste, weight), ...]} - a term can count towards several tastes
+        for taste, terms in taste_terms.items():
+            for term, weight in terms.items():
+                self.tastes_by_term.setdefault(term, []).append((taste, weight))
+
+        # Trie of all terms; each node has its child transitions, failure link, and terms ending at that node
+        self.transitions = [{}]
+        self.failures = [0]
+        self.outputs = [[]]
+        for term in self.tastes_by_term:
+            node = 0
+            for char in term:
+                if char not in self.transitions[node]:
+                    self.transitions.append({})
+                    self.failures.append(0)
+                    self.outputs.append([])
+                    self.transitions[node][char] = len(self.transitions) - 1
+                node = self.transitions[node][char]
+            self.outputs[node].append(term)
+
+        # Breadth-first pass to link each node to its longest proper suffix that is also in the trie
+        queue = deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.transitions[node].items():
+                queue.append(child)
+                fallback = self.failures[node]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.failures[fallback]
+                self.failures[child] = self.transitions[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.failures[child]]
+
+    def find_terms(self, text):
+        """Returns the set of every taste term occurring anywhere in the given text."""
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.transitions[node]:
+                node = self.failures[node]
+            node = self.transitions[node].get(char, 0)
+            if self.outputs[node]:
+                found.update(self.outputs[node])
+        return found
+
+
+term_index = TermIndex(tastes)
+
 keywords = {"chocolate", "green apple", "pineapple", "coconut", "orange", "strawberry", "raspberry", "tea", "lemon",
             "lime", "cherry", "cinnamon", "peach", "orange", "mint", "oak", "earthy", "smoke", "silky", "strong",
             "light-bodied", "full", "aged", "barreled", "hazy", "vibrant", "coffee", "roast"}
@@ -1,11 +1,16 @@
+import hashlib
+import os
+import pickle
 import re
+import time
 from decimal import Decimal
 from typing import override, Literal
 
 from rich.table import Table
+from unidecode import unidecode
 
 from data import flavors
-from data.db_connect import get_connection, close_connection
+from data.db_connect import get_connection, close_connection, get_catalog_path
 from data.flavors import tastes
 from display.rich_console import console, standardized_spacing, all_styles
 from utility import logger, utils
@@ -13,6 +18,17 @@ from utility.utils import quarter_round
 
 all_ingredients = []
 all_ingredients_dict = {}
+# Bumped by catalog_changed whenever the catalog is loaded or edited, so indexes built over it know to rebuild
+catalog_revision = 0
+
+# Bump when ingredient classes, their pickled attributes or taste profile generation change, so stale compiled
+# catalogs are rebuilt instead of loading ingredients with missing attributes.
+# 2: Taste profile caches on menu items and the type metadata registry
+catalog_version = 2
+catalog_tables = ("ingredients", "product_volumes", "tastes")
+
+_types_by_name = None
+_type_info = {}
 
 special_formats = {
     "Kolsch": "Kölsch",
@@ -155,14 +171,34 @@ class MenuItem:
         else:
             logger.logprint(f"[error]Menu item {self.name} not triggering Recipe, Beer, or other Alcohol")
 
+    def taste_signature(self):
+        """Returns the values the taste profile is generated from, so a cached profile can tell when it is stale."""
+        return self.flavor, self.character, self.notes, self.pour_vol()
+
+    def cached_taste_profile(self, **kwargs):
+        """Returns the generated taste profile, only regenerating it when the item's taste signature has changed."""
+        key = (self.taste_signature(), tuple(sorted(kwargs.items())))
+        cache = getattr(self, "_taste_cache", None)  # Items from older saves and catalogs have no cache yet
+        if cache is None or cache[0] != key:
+            # (key, full profile, {n: top n flavors})
+            self._taste_cache = (key, self.generate_taste_profile(**kwargs), {})
+        return self._taste_cache[1]
+
+    def _top_n(self, n, **kwargs):
+        """Returns the cached dict of the top N flavors, building it from the cached profile on first request."""
+        profile = self.cached_taste_profile(**kwargs)
+        top_n = self._taste_cache[2]
+        if n not in top_n:
+            top_n[n] = dict(list(profile.items())[:n])
+        return top_n[n]
+
     def top_flavors(self, n=3, **kwargs):
         """Return the top N flavors as a dict, ordered by percentage."""
-        profile = self.generate_taste_profile(**kwargs)
-        return dict(list(profile.items())[:n])
+        return dict(self._top_n(n, **kwargs))
 
     def has_flavor_in_top_n(self, flavor, n=3, **kwargs):
         """Return True if `flavor` appears in the top N taste profile."""
-        return flavor in self.top_flavors(n, **kwargs)
+        return flavor in self._top_n(n, **kwargs)
 
 # <editor-fold desc="Ingredients">
 class Ingredient:
@@ -208,30 +244,8 @@ class Ingredient:
         :param plural: Whether the type should be plural, i.e. "Whiskies"
         :return: Type string for use in sentences and tables
         """
-        type_name = type(self).__name__
-
-        # Check for special formats
-        if type_name in special_formats:
-            type_name = special_formats[type_name]
-        else:
-            # Add space before new word (except for first letter and "IPA")
-            type_name = re.sub(r'(?<!^)(?=[A-Z])', r' ', type_name)
-            type_name = type_name.replace("I P A", "IPA")
-
-        if plural:
-            if type_name in special_plurals:
-                type_name = special_plurals[type_name]
-            elif type_name.endswith("ey"):
-                type_name = type_name[:-2] + "ies"  # Replace "ey" with "ies"
-            elif type_name.endswith("y"):
-                type_name = type_name[:-1] + "ies"  # Replace "y" with "ies"
-            elif type_name.endswith("ch") or type_name.endswith("sh") or type_name.endswith("x") or type_name.endswith(
-                    "s") or type_name.endswith("z"):
-                type_name = f"{type_name}es"
-            else:
-                type_name = f"{type_name}s"
-
-        return type_name
+        info = type_info(type(self))
+        return info.plural if plural else info.name
 
     def format_oz(self):
         return ".0f"
@@ -245,16 +259,7 @@ class Ingredient:
 
     def get_style(self):
         """Gets the style name for the given type or its nearest parent in the theme."""
-        typ = self.format_type().lower()
-        if typ in all_styles:
-            return typ
-        else:
-            for parent_class in type(self).__bases__:
-                parent_object = parent_class()
-                style = parent_object.get_style()
-                if style:
-                    return style
-        return ""
+        return type_info(type(self)).style
 
     def description(self, markup=True):  # {Name} is a/an {character} {flavor}{type}{notes}.
         """
@@ -327,45 +332,42 @@ class Ingredient:
             name = self.name
 
         if feedback and not vol_in_recipe:
-            logger.log(f"Generating taste profile for {name}:")
+            logger.trace("ingredients", "Generating taste profile for %s:", name)
 
         if name.startswith("Rhinegeist"):
             taste_profile["citrusy"] = Decimal(4.00)
             taste_profile["fruity"] = Decimal(1.00)
 
-        name_to_type = {typ.__name__: typ for typ in all_ingredient_types()}
-        for taste in flavors.tastes:
-            points = Decimal()
-            for word in flavors.tastes[taste]:
-                desc_weight = Decimal()
-                points_added = 0
-                if word in name_to_type:
-                    typ = name_to_type[word]
-                    if isinstance(self, typ):
-                        desc_weight += Decimal(3)
-                if self.flavor != "":
-                    if word in self.flavor:
-                        desc_weight += Decimal(5)
-                if self.character:
-                    if word in self.character:
-                        desc_weight += Decimal(3)
-                if self.notes:
-                    if word in self.notes:
-                        desc_weight += Decimal(0.75)
-                term_weight = Decimal(flavors.tastes[taste][word])
-
-                if vol_in_recipe:
-                    vol = vol_in_recipe
-                elif isinstance(self, MenuItem):
-                    vol = self.pour_vol()
-                else:
-                    vol = 1
+        # Weight each matching term by where it was found, scanning each descriptor once for every term it contains
+        desc_weights = {}
+        types_by_name = ingredient_types_by_name()
+        for cls in type(self).__mro__:
+            if types_by_name.get(cls.__name__) is cls and cls.__name__ in flavors.term_index.tastes_by_term:
+                desc_weights[cls.__name__] = desc_weights.get(cls.__name__, Decimal()) + Decimal(3)
+        for text, weight in ((self.flavor, Decimal(5)), (self.character, Decimal(3)), (self.notes, Decimal(0.75))):
+            if text:
+                for word in flavors.term_index.find_terms(text):
+                    desc_weights[word] = desc_weights.get(word, Decimal()) + weight
+
+        if vol_in_recipe:
+            vol = vol_in_recipe
+        elif isinstance(self, MenuItem):
+            vol = self.pour_vol()
+        else:
+            vol = 1
+
+        taste_points = {}
+        for word, desc_weight in desc_weights.items():
+            for taste, weight in flavors.term_index.tastes_by_term[word]:
+                term_weight = Decimal(weight)
                 points_added = round(Decimal(term_weight * desc_weight * vol), 2)
-                points += points_added
+                taste_points[taste] = taste_points.get(taste, Decimal()) + points_added
                 if points_added > 0 and feedback:
-                    logger.log(
-                        f"    {term_weight}(term) * {desc_weight}(desc) * {vol}(vol) = {points_added} points in {taste} from \"{word}\" in {name}")
+                    logger.trace("ingredients", "    %s(term) * %s(desc) * %s(vol) = %s points in %s from \"%s\" in %s",
+                                 term_weight, desc_weight, vol, points_added, taste, word, name)
 
+        for taste in sorted(taste_points, key=flavors.term_index.taste_order.get):
+            points = taste_points[taste]
             if points > 0:
                 try:
                     taste_profile[taste] += points
@@ -1104,6 +1106,85 @@ class Fruit(Additive):
 # </editor-fold>  # Ingredients
 
 
+# <editor-fold desc="Type registry">
+class TypeInfo:
+    """Display, parsing and portioning details for one ingredient class, worked out once instead of on every call."""
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.ancestors = tuple(parent for parent in cls.__mro__ if issubclass(parent, Ingredient))
+        if issubclass(cls, Ingredient):
+            self.name = format_type_name(cls.__name__)
+            self.plural = format_type_name(cls.__name__, plural=True)
+            self.style = self.find_style()
+            self.portions = cls().get_portions()  # Shared; read from it, don't change it
+        else:  # Other menu item classes, like Recipe, format themselves
+            obj = cls()
+            self.name = obj.format_type()
+            self.plural = obj.format_type(plural=True)
+            self.style = obj.get_style()
+            self.portions = {}
+        self.command = unidecode(self.name.lower())
+        self.plural_command = unidecode(self.plural.lower())
+
+    def find_style(self):
+        """Gets the style name for the class or its nearest parent in the theme."""
+        style = self.name.lower()
+        if style in all_styles:
+            return style
+        for parent_class in self.cls.__bases__:
+            if issubclass(parent_class, Ingredient):
+                style = type_info(parent_class).style
+                if style:
+                    return style
+        return ""
+
+    def format(self, plural=False):
+        """Returns the readable singular or plural name of the type."""
+        return self.plural if plural else self.name
+
+
+def type_info(cls):
+    """Returns the TypeInfo for the given ingredient (or menu item) class, building it on first use."""
+    info = _type_info.get(cls)
+    if info is None:
+        info = _type_info[cls] = TypeInfo(cls)
+    return info
+
+
+def format_type_name(type_name, plural=False):
+    """
+    Converts a class name to a readable and grammatically correct string, i.e. "DoubleIPA" to "Double IPA".
+
+    :param plural: Whether the type should be plural, i.e. "Whiskies"
+    """
+    # Check for special formats
+    if type_name in special_formats:
+        type_name = special_formats[type_name]
+    else:
+        # Add space before new word (except for first letter and "IPA")
+        type_name = re.sub(r'(?<!^)(?=[A-Z])', r' ', type_name)
+        type_name = type_name.replace("I P A", "IPA")
+
+    if plural:
+        if type_name in special_plurals:
+            type_name = special_plurals[type_name]
+        elif type_name.endswith("ey"):
+            type_name = type_name[:-2] + "ies"  # Replace "ey" with "ies"
+        elif type_name.endswith("y"):
+            type_name = type_name[:-1] + "ies"  # Replace "y" with "ies"
+        elif type_name.endswith("ch") or type_name.endswith("sh") or type_name.endswith("x") or type_name.endswith(
+                "s") or type_name.endswith("z"):
+            type_name = f"{type_name}es"
+        else:
+            type_name = f"{type_name}s"
+
+    return type_name
+
+
+# </editor-fold>
+
+
 # <editor-fold desc="Functions">
 def get_constructor_params(ingredient_type):
     """Gets the necessary constructor parameter names for the given ingredient type."""
@@ -1144,36 +1225,121 @@ def create_instance(ingredient_type, row_data):
     return ing
 
 
-def load_ingredients_from_db():
-    """Populates all_ingredients with ingredients from the database, including their available volumes and prices."""
+def catalog_hash(cursor):
+    """Hashes the contents of every table the ingredient catalog is compiled from, along with the catalog version."""
+    digest = hashlib.sha256(f"catalog v{catalog_version}".encode())
+    for table in catalog_tables:
+        digest.update(table.encode())
+        cursor.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3")
+        for row in cursor.fetchall():
+            digest.update(repr(tuple(row)).encode())
+    return digest.hexdigest()
+
+
+def catalog_changed():
+    """Marks the ingredient catalog as changed. Call after adding, removing or editing catalog ingredients."""
+    global catalog_revision
+    catalog_revision += 1
+
+
+def load_catalog(db_hash):
+    """
+    Reads the compiled ingredient catalog from disk.
+
+    :param db_hash: The current hash of the catalog tables in the database
+    :return: The list of compiled ingredient objects, or None if the catalog is missing, unreadable or out of date
+    """
+    path = get_catalog_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            catalog = pickle.load(f)
+    except Exception as e:
+        logger.log(f"Ingredient catalog at {path} could not be read ({e}); rebuilding")
+        return None
+
+    if catalog.get("hash") != db_hash:
+        logger.log("Ingredient catalog is out of date with the database; rebuilding")
+        return None
+    return catalog["ingredients"]
+
+
+def save_catalog(db_hash, ingredients):
+    """Writes the compiled ingredients, with their volumes and taste profiles, to the catalog file."""
+    path = get_catalog_path()
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            pickle.dump({"hash": db_hash, "ingredients": ingredients}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)  # Replace in one step so a partial write is never read as the catalog
+        logger.log(f"Ingredient catalog saved to {path}")
+    except OSError as e:
+        logger.log(f"Ingredient catalog could not be saved ({e})")
+
+
+def load_ingredients_from_db(use_catalog=True):
+    """
+    Populates all_ingredients with ingredients from the database, including their available volumes and prices.
+
+    Ingredients and product volumes are each read with a single query, and volumes are grouped by product in memory so
+    every ingredient object can be built in one pass over the rows.
+
+    :param use_catalog: Set to False to ignore the compiled catalog and always build ingredients from the database.
+    """
+    start_time = time.perf_counter()
     connection = get_connection()
     cursor = connection.cursor()
     global all_ingredients
+
+    # Skip building entirely when the compiled catalog matches the database
+    if use_catalog:
+        db_hash = catalog_hash(cursor)
+        catalog = load_catalog(db_hash)
+        if catalog is not None:
+            close_connection(connection)
+            for ingredient in catalog:
+                all_ingredients.append(ingredient)
+                all_ingredients_dict[ingredient.name] = ingredient
+            catalog_changed()
+            logger.log(f"Loaded {len(catalog)} ingredients from catalog in {time.perf_counter() - start_time:.3f}s")
+            return
+
+    # Group every product's volume options up front instead of querying once per ingredient
+    cursor.execute("SELECT product_name, volume, price FROM product_volumes")
+    volumes_by_product = {}
+    for product_name, volume, price in cursor.fetchall():
+        volumes_by_product.setdefault(product_name, {})[int(volume)] = price
+
     cursor.execute("SELECT * FROM ingredients")
-    column_names = [description[0] for description in cursor.description]
-    for row in cursor.fetchall():
-        ingredient_type = dict(zip(column_names, row))["type"]
-        product_name = dict(zip(column_names, row))["name"]
+    rows = cursor.fetchall()
+    close_connection(connection)
 
-        cursor.execute("SELECT volume, price FROM product_volumes WHERE product_name=?", (product_name,))
-        volume_data = cursor.fetchall()
-        volumes = {}
+    loaded = []
+    for row in rows:
+        ingredient_data = dict(row)
+        product_name = ingredient_data["name"]
 
-        if len(volume_data) < 1:
+        volumes = volumes_by_product.get(product_name, {})
+        if len(volumes) < 1:
             if product_name.lower() != "club soda":
                 raise Exception(f"No volume data for {product_name}")
-        for vol in volume_data:
-            volumes[int(vol[0])] = vol[1]
-
-        ingredient_data = dict(zip(column_names, row))
         ingredient_data['volumes'] = volumes
 
-        ingredient = create_instance(ingredient_type, ingredient_data)
+        ingredient = create_instance(ingredient_data["type"], ingredient_data)
 
         if ingredient:
+            loaded.append(ingredient)
             all_ingredients.append(ingredient)
             all_ingredients_dict[ingredient.name] = ingredient
-    close_connection(connection)
+    catalog_changed()
+
+    elapsed = time.perf_counter() - start_time
+    logger.log(f"Loaded {len(rows)} ingredients and {sum(len(v) for v in volumes_by_product.values())} product volumes "
+               f"in {elapsed:.3f}s")
+
+    if use_catalog:
+        save_catalog(db_hash, loaded)
 
 
 def list_ingredients(container=all_ingredients, typ=Ingredient, no_inheritance=False):
@@ -1208,6 +1374,14 @@ def all_ingredient_types(typ=Ingredient):
     return subclasses
 
 
+def ingredient_types_by_name():
+    """Returns a map of class names to all ingredient classes, built once on first use."""
+    global _types_by_name
+    if _types_by_name is None:
+        _types_by_name = {typ.__name__: typ for typ in all_ingredient_types()}
+    return _types_by_name
+
+
 def get_ingredient(ingredient_name):
     """Returns the Ingredient object corresponding to the given name."""
     return all_ingredients_dict[ingredient_name]
@@ -0,0 +1,139 @@
+import heapq
+import re
+import time
+
+from unidecode import unidecode
+
+from data import ingredients
+from utility import logger
+
+# How much a query word matching a word in each field counts towards a result's score
+field_weights = {"name": 10, "flavor": 6, "type": 4, "character": 2, "notes": 2}
+# Scales a field's weight by how the query word matched: the whole word, its beginning, or letters spread through it
+exact_match = 3
+prefix_match = 2
+subsequence_match = 1
+
+_catalog_index = None
+
+
+def search_words(text):
+    """Transliterates and lowercases text, and splits it into words for searching."""
+    if not text:
+        return []
+    return re.findall(r"[a-z0-9]+", unidecode(text).lower().replace("'", ""))
+
+
+def is_subsequence(query_word, word):
+    """Whether the letters of the query word appear in the word in order, not necessarily together."""
+    letters = iter(word)
+    return all(letter in letters for letter in query_word)
+
+
+class SearchIndex:
+    """
+    Ranked fuzzy search over ingredients by their name, flavor, type, character and notes.
+    Query words are matched against indexed words in full, by prefix, or as subsequences (for typos like "wisky"), and
+    every query word must match somewhere in an ingredient for it to be a result.
+    """
+
+    def __init__(self, ingredient_list):
+        self.ingredients = list(ingredient_list)
+        self.names = [" ".join(search_words(ingredient.name)) for ingredient in self.ingredients]
+        self.postings = {}  # {word: {row: weight of the best field the word appears in}}
+        self.prefixes = {}  # {prefix: [words starting with it]}
+        self.words_with_letter = {}  # {letter: {words containing it}}
+        self.query_matches = {}  # {query word: {word: match factor}}, filled as queries come in
+
+        for row, ingredient in enumerate(self.ingredients):
+            # Parent types too, so "whiskey" finds bourbons
+            type_names = " ".join(ingredients.type_info(cls).name
+                                  for cls in ingredients.type_info(type(ingredient)).ancestors[:-1])
+            fields = {"name": ingredient.name, "flavor": ingredient.flavor, "type": type_names,
+                      "character": ingredient.character, "notes": ingredient.notes}
+            for field, text in fields.items():
+                for word in search_words(text):
+                    rows = self.postings.setdefault(word, {})
+                    rows[row] = max(rows.get(row, 0), field_weights[field])
+
+        for word in self.postings:
+            for end in range(1, len(word) + 1):
+                self.prefixes.setdefault(word[:end], []).append(word)
+            for letter in word:
+                self.words_with_letter.setdefault(letter, set()).add(word)
+
+    def match_words(self, query_word):
+        """Returns the indexed words the query word matches, with how strongly each matches."""
+        matches = self.query_matches.get(query_word)
+        if matches is not None:
+            return matches
+
+        matches = {}
+        for word in self.prefixes.get(query_word, ()):
+            matches[word] = exact_match if word == query_word else prefix_match * len(query_word) / len(word)
+        # Letters spread through a word only count for 3+ letters, otherwise nearly every word would match
+        if len(query_word) >= 3:
+            candidates = set.intersection(*(self.words_with_letter.get(letter, set()) for letter in set(query_word)))
+            for word in candidates:
+                if word not in matches and is_subsequence(query_word, word):
+                    matches[word] = subsequence_match * len(query_word) / len(word)
+
+        if len(self.query_matches) >= 1024:
+            self.query_matches.clear()
+        self.query_matches[query_word] = matches
+        return matches
+
+    def search(self, query, k=5, within=None):
+        """
+        Finds the ingredients that best match the query.
+
+        :param query: The user's search text, e.g. "wisky" or "lemon vodka".
+        :param k: The most results to return.
+        :param within: Optional collection of ingredients to limit results to, e.g. those in the current shop section.
+        :return: A list of up to k (ingredient, score) tuples, best match first.
+        """
+        query_words = search_words(query)
+        if not query_words:
+            return []
+
+        scores = None
+        for query_word in query_words:
+            word_scores = {}  # {row: score for this query word}
+            for word, factor in self.match_words(query_word).items():
+                for row, weight in self.postings[word].items():
+                    score = weight * factor
+                    if score > word_scores.get(row, 0):
+                        word_scores[row] = score
+            if scores is None:
+                scores = word_scores
+            else:  # Every query word has to match
+                scores = {row: score + word_scores[row] for row, score in scores.items() if row in word_scores}
+            if not scores:
+                return []
+
+        # Favor names that start with, or are exactly, the whole query
+        query_name = " ".join(query_words)
+        for row in scores:
+            if self.names[row] == query_name:
+                scores[row] += field_weights["name"] * exact_match
+            elif self.names[row].startswith(query_name):
+                scores[row] += field_weights["name"] * prefix_match
+
+        if within is not None:
+            within = set(within)
+            scores = {row: score for row, score in scores.items() if self.ingredients[row] in within}
+        # Ties go to the shorter, then alphabetically first, name
+        best = heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], len(self.names[item[0]]),
+                                                                   self.names[item[0]]))
+        return [(self.ingredients[row], round(score, 2)) for row, score in best]
+
+
+def catalog_search():
+    """Returns the search index for the whole ingredient catalog, building it on first use."""
+    global _catalog_index
+    if _catalog_index is None or len(_catalog_index.ingredients) != len(ingredients.all_ingredients):
+        start_time = time.perf_counter()
+        _catalog_index = SearchIndex(ingredients.all_ingredients)
+        logger.log(f"Built search index of {len(_catalog_index.postings)} words for "
+                   f"{len(_catalog_index.ingredients)} ingredients in {time.perf_counter() - start_time:.3f}s")
+    return _catalog_index
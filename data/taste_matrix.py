@@ -0,0 +1,183 @@
+from collections.abc import Mapping
+from decimal import Decimal
+
+from data import flavors, ingredients
+from data.ingredients import Ingredient, Liqueur, MenuItem, Spice
+from utility import logger
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the dict-based taste profiles work without it
+    np = None
+
+# Stable column ordering for every taste matrix
+taste_columns = list(flavors.tastes)
+taste_column_index = {taste: column for column, taste in enumerate(taste_columns)}
+
+_catalog_matrix = None
+
+
+class TasteProfileView(Mapping):
+    """
+    Read-only dict-like view of one row of a taste matrix, ordered and valued like the Decimal taste profile dicts
+    (highest first, zero tastes omitted, values rounded to one decimal place).
+    """
+
+    def __init__(self, row):
+        self.row = row
+        columns = [column for column in np.argsort(-row, kind="stable") if row[column] > 0]
+        self._tastes = [taste_columns[column] for column in columns]
+
+    def __getitem__(self, taste):
+        value = self.row[taste_column_index[taste]]
+        if value <= 0:
+            raise KeyError(taste)
+        return Decimal(str(round(float(value), 1)))
+
+    def __iter__(self):
+        return iter(self._tastes)
+
+    def __len__(self):
+        return len(self._tastes)
+
+
+def source_profile(ingredient: Ingredient):
+    """
+    Returns the taste profile dict the rest of the game reads for the ingredient: the cached profile for menu items,
+    which is replaced whenever it's regenerated, and the profile generated on loading for anything else.
+    """
+    if isinstance(ingredient, MenuItem):
+        return ingredient.cached_taste_profile()
+    return ingredient.taste_profile
+
+
+class TasteMatrix:
+    """
+    Float32 matrix of ingredient taste profiles (ingredients x tastes), for batch taste operations.
+
+    Rows are copied from the same profile dicts the dict API reads, and keep a copy of what they were copied from.
+    Reads go through sync, which recopies any row whose ingredient's profile has been replaced or edited since, so the
+    matrix can't drift from the dicts. A matrix built before the catalog last changed refuses to be read.
+    """
+
+    def __init__(self, ingredient_list):
+        if np is None:
+            raise ImportError("NumPy is required to build a taste matrix")
+        self.ingredients = list(ingredient_list)
+        self.row_index = {ingredient: row for row, ingredient in enumerate(self.ingredients)}
+        self.matrix = np.zeros((len(self.ingredients), len(taste_columns)), dtype=np.float32)
+        self.sources = [None] * len(self.ingredients)  # Copy of the profile dict each row was last copied from
+        self.revision = ingredients.catalog_revision  # Rows are laid out for the catalog as of this revision
+        self.sync()
+
+    def check_revision(self):
+        """Raises a ValueError if the catalog has changed since the matrix was built, so its rows no longer match."""
+        if self.revision != ingredients.catalog_revision:
+            raise ValueError(f"Taste matrix was built at catalog revision {self.revision}, "
+                             f"but the catalog is now at revision {ingredients.catalog_revision}")
+
+    def sync(self, rows=None):
+        """
+        Recopies the rows whose ingredients' taste profiles have been replaced or edited since they were copied.
+
+        :param rows: Iterable of row numbers to check. Leave None to check every row.
+        """
+        self.check_revision()
+        for row in range(len(self.ingredients)) if rows is None else rows:
+            profile = source_profile(self.ingredients[row])
+            if profile != self.sources[row]:
+                self.matrix[row] = 0
+                for taste, points in profile.items():
+                    self.matrix[row, taste_column_index[taste]] = float(points)
+                self.sources[row] = dict(profile)
+
+    def row(self, ingredient: Ingredient):
+        """Returns the ingredient's up-to-date taste vector."""
+        row = self.row_index[ingredient]
+        self.sync((row,))
+        return self.matrix[row]
+
+    def profile(self, ingredient: Ingredient):
+        """Returns a dict-like view of the given ingredient's taste profile."""
+        return TasteProfileView(self.row(ingredient))
+
+    def recipe_weights(self, recipe, by_volume=False):
+        """
+        Builds the weight vector (one entry per matrix row) that combines ingredient profiles into a recipe profile.
+
+        :param recipe: The Recipe to weight.
+        :param by_volume: Leave False to weight each specific ingredient equally, matching Recipe.generate_taste_profile
+        up to rounding, or set True to weight by fluid ounces poured (with the same boost given to small portions of
+        liqueurs and spices).
+        :return: A float32 array of weights, with zeros for ingredients not in the recipe.
+        """
+        weights = np.zeros(len(self.ingredients), dtype=np.float32)
+        for r_ingredient, portion in recipe.r_ingredients.items():
+            # Type requirements have no fixed taste until an ingredient is poured
+            if isinstance(r_ingredient, type) or r_ingredient not in self.row_index:
+                continue
+            if by_volume:
+                volume = r_ingredient.get_portions()[portion]
+                if isinstance(r_ingredient, (Liqueur, Spice)):
+                    if volume < 0.2:
+                        volume = volume * 20
+                    elif 0.2 < volume < 0.5:
+                        volume = volume * 10
+                weights[self.row_index[r_ingredient]] += volume
+            else:
+                weights[self.row_index[r_ingredient]] += 1
+        return weights
+
+    def recipe_vector(self, recipe, by_volume=False):
+        """Returns the recipe's taste profile as a vector over taste_columns."""
+        weights = self.recipe_weights(recipe, by_volume)
+        self.sync(np.flatnonzero(weights))
+        return weights @ self.matrix
+
+    def recipe_profile(self, recipe, by_volume=False):
+        """Returns a dict-like view of the recipe's taste profile computed from the matrix."""
+        return TasteProfileView(self.recipe_vector(recipe, by_volume))
+
+    def item_matrix(self, menu_items):
+        """Stacks the taste vectors of the given menu items (ingredients or recipes) into an items x tastes array."""
+        rows = np.zeros((len(menu_items), len(taste_columns)), dtype=np.float32)
+        for index, item in enumerate(menu_items):
+            if isinstance(item, Ingredient):
+                rows[index] = self.row(item)
+            else:
+                rows[index] = self.recipe_vector(item)
+        return rows
+
+    @staticmethod
+    def top_n_mask(rows, n):
+        """
+        Marks the top N tastes of each row, as a boolean array of the same shape. Tastes with no points are never
+        included, and ties are broken by column order.
+        """
+        mask = np.zeros(rows.shape, dtype=bool)
+        if n <= 0:
+            return mask
+        # A stable sort keeps equal tastes in column order
+        top = np.argsort(-rows, axis=1, kind="stable")[:, :n]
+        np.put_along_axis(mask, top, True, axis=1)
+        return mask & (rows > 0)
+
+    def items_with_taste_in_top_n(self, menu_items, taste, n=3):
+        """Returns the menu items that have the given taste among their top N tastes."""
+        mask = self.top_n_mask(self.item_matrix(menu_items), n)[:, taste_column_index[taste]]
+        return [item for item, has_taste in zip(menu_items, mask) if has_taste]
+
+
+def catalog_matrix():
+    """
+    Returns the taste matrix for the whole ingredient catalog, building it on first use.
+
+    :return: The TasteMatrix, or None if NumPy is not installed.
+    """
+    global _catalog_matrix
+    if np is None:
+        return None
+    if _catalog_matrix is None or _catalog_matrix.revision != ingredients.catalog_revision:
+        _catalog_matrix = TasteMatrix(ingredients.all_ingredients)
+        logger.log(f"Built {_catalog_matrix.matrix.shape[0]}x{_catalog_matrix.matrix.shape[1]} catalog taste matrix")
+    return _catalog_matrix
@@ -1,3 +1,5 @@
+import threading
+import time
 from itertools import cycle
 from typing import Callable, Optional
 
@@ -39,24 +41,39 @@ def bump_console_height(down=False):
     console.size = (width, height)
 
 
-def draw_sentinel_update(key):  # Unspecified key is used by listener below
-    """Sets global sentinel to True to stop the cycling of the live display."""
-    global draw_sentinel
-    draw_sentinel = True
-    raise keyboard.Listener.StopException()
+class KeyListener:
+    """
+    A single keyboard listener for a whole live display session, flagging any keypress to the render loop, instead of
+    starting a new listener (and OS thread) after every frame.
+    """
+
+    def __init__(self):
+        self.pressed = threading.Event()
+        self.listener = keyboard.Listener(on_press=self.on_press)  # , suppress=True
+
+    def on_press(self, key):
+        """Runs on the listener's thread; only signals the render loop, which stops the display itself."""
+        self.pressed.set()
+
+    def wait(self, sec):
+        """Waits up to the given number of seconds, returning True as soon as a key is pressed."""
+        return self.pressed.wait(max(sec, 0))
 
+    def __enter__(self):
+        self.listener.start()
+        return self
 
-def listen(sec: int):
-    """Listens for a keypress for the given number of seconds after each live page has been drawn."""
-    with keyboard.Listener(on_press=draw_sentinel_update) as listener:  # , suppress=True
-        listener.join(sec)
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.listener.stop()
+        self.listener.join()
 
 
 def draw_live(update_function: Callable, sec):
     """
     Update a live display using the {update_function} every {sec} sec
 
-    :param update_function: A callable that performs the display update. It should accept a 'stop' function
+    :param update_function: A callable that performs the display update. It should accept a 'stop' function and the
+    live display, and may return False to skip refreshing the screen when nothing changed
     :param sec: The number of seconds to wait in between display updates.
     """
     bump_console_height()
@@ -79,10 +96,20 @@ def draw_live(update_function: Callable, sec):
                 draw_sentinel = True
                 logger.log("Stopping live display.")
 
-            while not draw_sentinel:
-                update_function(stop_display, tracked_live)
-                tracked_live.refresh()
-                listen(sec=sec)
+            with KeyListener() as key_listener:
+                # Frames are due at fixed intervals from the start, so time spent drawing doesn't stretch each tick
+                next_frame = time.monotonic()
+                while not draw_sentinel:
+                    # Update functions can return False when nothing changed, so the frame isn't redrawn
+                    if update_function(stop_display, tracked_live) is not False:
+                        tracked_live.refresh()
+
+                    next_frame += sec
+                    now = time.monotonic()
+                    if next_frame < now:  # Fell behind, e.g. a slow frame; carry on from now rather than rushing
+                        next_frame = now
+                    if key_listener.wait(next_frame - now):
+                        draw_sentinel = True
 
         if (
             tracked_live is not None
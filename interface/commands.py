@@ -5,13 +5,16 @@ import rich.box
 from rich.panel import Panel
 from unidecode import unidecode
 
-from data import ingredients
+from data import ingredients, search
 from display.rich_console import console
 from interface import ui
 from recipe import Recipe
 from utility import utils, logger
 
 persistent_commands = {"shop", "menu"}
+_command_indexes = {}  # {commands: CommandIndex}, see command_index
+_catalog_names = None  # (ingredients.catalog_revision, CommandNames) for ingredients.all_ingredients
+clear_match_ratio = 1.5  # How many times the next best score a search result needs to be used without asking
 help_panels = {
     "help": f"Syntax: [cmd]'help \\[term]'[/cmd]\n"
             f"[cmd]'Help'[/cmd] can be used on commands (shop, add, etc), products (lychee, Ketel One Classic, etc), "
@@ -93,58 +96,240 @@ def draw_help_panel(term):
     console.print(panel)
 
 
+class CommandNames:
+    """
+    Command strings for one list of ingredients, types, recipes and/or strings, and the items they each parse back to,
+    so commands are resolved with a lookup instead of normalizing every name in the list.
+    """
+
+    def __init__(self, lst: Iterable):
+        self.commands = set()  # Singular type names, e.g. lager
+        self.plural_commands = set()  # Plural type names, e.g. lagers
+        self.items = {}  # {command: item}, with singular type names
+        self.plural_items = {}  # {command: item}, with plural type names
+        for entry in lst:
+            self.add(entry)
+
+    def add(self, entry):
+        """Adds the commands for one entry. An earlier entry with the same command keeps it."""
+        if isinstance(entry, type):
+            info = ingredients.type_info(entry)
+            self.commands.add(info.command)
+            self.plural_commands.add(info.plural_command)
+            if entry == Recipe:
+                self.items.setdefault("cocktails", entry)
+                self.plural_items.setdefault("cocktails", entry)
+            else:
+                self.items.setdefault(info.command, entry)
+                self.plural_items.setdefault(info.plural_command, entry)
+            return
+        if isinstance(entry, (ingredients.Ingredient, Recipe)):
+            command = unidecode(entry.name.lower())
+        elif isinstance(entry, str):
+            command = entry.lower()
+        else:
+            console.print("[error]command_to_item argument not registering as type or Ingredient")
+            return
+        self.commands.add(command)
+        self.plural_commands.add(command)
+        self.items.setdefault(command, entry)
+        self.plural_items.setdefault(command, entry)
+
+
+def command_names(lst: Iterable):
+    """
+    Returns the CommandNames for the given items, or lst itself if it already is one. The ingredient catalog's are kept
+    until ingredients.catalog_changed is called. Other lists are indexed on each call, so owners of lists that are
+    looked up often keep their own and drop them when the list changes, as BarMenu.get_command_names does.
+    """
+    global _catalog_names
+    if isinstance(lst, CommandNames):
+        return lst
+    if lst is ingredients.all_ingredients:
+        if _catalog_names is None or _catalog_names[0] != ingredients.catalog_revision:
+            _catalog_names = ingredients.catalog_revision, CommandNames(lst)
+            logger.log(f"Built command names for {len(lst)} catalog ingredients")
+        return _catalog_names[1]
+    return CommandNames(lst)
+
+
 def items_to_commands(lst: Iterable, plural_types=True):
     """
     Converts a list of ingredients, ingredient types, and/or strings into a list of commands for parsing.
 
-    :param lst: List of ingredient objects
+    :param lst: List of ingredient objects, or the CommandNames already built for one
     :param plural_types: Whether types should be pluralized, i.e. Liqueurs, Lagers
     :return: A set of command strings to match input to
     """
-    commands = set("")
-    for entry in lst:
-        if isinstance(entry, type):
-            obj = entry()
-            commands.add(unidecode(obj.format_type(plural=plural_types).lower()))
-        elif isinstance(entry, ingredients.Ingredient):
-            commands.add(unidecode(entry.name.lower()))
-        elif isinstance(entry, str):
-            commands.add(entry.lower())
-        elif isinstance(entry, Recipe):
-            commands.add(entry.name.lower())
-
-    return commands
+    names = command_names(lst)
+    return set(names.plural_commands if plural_types else names.commands)
 
 
 def command_to_item(cmd, lst, plural=False):
     """
     Matches a string command to an ingredient or type from the given list.
     :param cmd: Full command string
-    :param lst: Reference list of types, ingredients, recipes, and/or strings
+    :param lst: Reference list of types, ingredients, recipes, and/or strings, or the CommandNames already built for one
     :param plural: Whether type names are plural.
     :return: The matching item, if found.
     """
-    if cmd is None:
+    if not isinstance(cmd, str):  # No command, or a (command, args) tuple from find_command, names no item
         return None
-    for entry in lst:
-        if isinstance(entry, type):
-            if entry == Recipe:
-                if cmd == "cocktails":
-                    return Recipe
-            elif f"{unidecode(entry().format_type(plural).lower())}" == cmd:
-                return entry
-        elif isinstance(entry, ingredients.Ingredient):
-            if cmd == unidecode(entry.name.lower()):
-                return entry
-        elif isinstance(entry, Recipe):
-            if cmd == unidecode(entry.name.lower()):
-                return entry
-        elif isinstance(entry, str):
-            if cmd == entry.lower():
-                return entry
-        else:
-            console.print("[error]command_to_item argument not registering as type or Ingredient")
-    return None
+    names = command_names(lst)
+    return (names.plural_items if plural else names.items).get(cmd)
+
+
+class CommandIndex:
+    """
+    Precompiled lookup for one set of commands, so find_command doesn't re-sort and re-split every command on every input.
+    Maps every prefix of every command word (and every whole word) to the commands containing it, narrowing each input
+    down to the few commands that could match before they're checked word by word.
+    """
+
+    def __init__(self, commands):
+        sorted_commands = sorted(commands)
+        sorted_commands.insert(0, "help")
+        # Re-insert "back" at end of list
+        if "back" in sorted_commands:
+            sorted_commands.remove("back")
+            sorted_commands.append("back")
+        sorted_commands.append("quit")
+        self.commands = sorted_commands
+
+        self.word_counts = []
+        self.by_prefix = {}  # {prefix of a command word: {command indexes}}
+        self.by_word = {}  # {command word: {command indexes}}
+        for position, command in enumerate(sorted_commands):
+            words = command.split()
+            self.word_counts.append(len(words))
+            for word in words:
+                self.by_word.setdefault(word, set()).add(position)
+                for end in range(1, len(word) + 1):
+                    self.by_prefix.setdefault(word[:end], set()).add(position)
+        self.by_substring = {}  # Filled as inputs come in: {input word: {indexes of commands with a word containing it}}
+        self.patterns = {}  # {input word: compiled pattern}, for inputs containing regex characters
+
+    def with_substring(self, input_word):
+        """Returns the indexes of commands with a word containing the input word."""
+        positions = self.by_substring.get(input_word)
+        if positions is None:
+            positions = set()
+            for word, word_positions in self.by_word.items():
+                if input_word in word:
+                    positions |= word_positions
+            self.by_substring[input_word] = positions
+        return positions
+
+    def contains(self, input_word, cmd_word):
+        """Checks whether the letters of the input word appear in order, together, within the command word."""
+        if re.escape(input_word) == input_word:
+            return input_word in cmd_word
+        # Input with regex characters keeps the behaviour of matching it as a pattern
+        pattern = self.patterns.get(input_word)
+        if pattern is None:
+            try:
+                pattern = re.compile(r"\s*".join(input_word))
+            except re.error:
+                pattern = re.compile(re.escape(input_word))
+            self.patterns[input_word] = pattern
+        return pattern.search(cmd_word) is not None
+
+    def candidates(self, input_words, startswith_below):
+        """
+        Narrows the commands down to those that could match every input word, in command order.
+
+        :param startswith_below: Input words shorter than this must match the beginning of a command word.
+        """
+        positions = None
+        for i, input_word in enumerate(input_words):
+            if re.escape(input_word) != input_word:
+                continue  # Regex characters can match anything, so these can't narrow the search
+            # Later input words are matched against whatever's left of the command, which may start mid-word
+            if i == 0 and len(input_word) < startswith_below:
+                word_positions = self.by_prefix.get(input_word, set())
+            else:
+                word_positions = self.with_substring(input_word)
+            positions = word_positions if positions is None else positions & word_positions
+            if not positions:
+                return []
+        if positions is None:
+            return range(len(self.commands))
+        return sorted(position for position in positions if self.word_counts[position] >= len(input_words))
+
+    def startswith_matches(self, input_words, force_beginning=False):
+        """Commands whose words start with the input words (or contain them, for inputs of 4 or more letters)."""
+        matching_commands = []
+        startswith_below = float("inf") if force_beginning else 4
+        for position in self.candidates(input_words, startswith_below):
+            command = self.commands[position]
+            remaining_command = command # This will shrink as words are matched
+            matching = True
+            for input_word in input_words:
+                inpt_word_has_match = False
+                # Try to match the next word in the input to any word in the remaining command
+                for cmd_word in remaining_command.split():
+                    # If 3 or fewer letters are used, or we've forced matching to the beginning of words only
+                    if len(input_word) < 4 or force_beginning:
+                        if cmd_word.startswith(input_word):
+                            inpt_word_has_match = True
+                            try:
+                                remaining_command = command.split(cmd_word)[1]
+                            except IndexError:
+                                remaining_command = command.split(cmd_word)[0]
+                            break
+                    # Check if the input word is anywhere in the command word
+                    elif self.contains(input_word, cmd_word):
+                        inpt_word_has_match = True
+                        break
+                # If any input word does not get a match, this isn't the command
+                if not inpt_word_has_match:
+                    matching = False
+                    break
+            if matching:
+                matching_commands.append(command)
+        return matching_commands
+
+    def midword_matches(self, input_words):
+        """Commands with words containing the input words anywhere (or starting with them, for inputs under 3 letters)."""
+        matching_commands = []
+        for position in self.candidates(input_words, 3):
+            command = self.commands[position]
+            remaining_command = command
+            matching = True
+            for input_word in input_words:
+                inpt_word_has_match = False
+                for cmd_word in remaining_command.split():
+                    # Match to beginning of word if <3 letters given
+                    if len(input_word) < 3:
+                        if cmd_word.startswith(input_word):
+                            inpt_word_has_match = True
+                            try:
+                                remaining_command = command.split(f"{cmd_word} ")[1]
+                            except IndexError:
+                                remaining_command = command.split(cmd_word)[0]
+                            break
+                    elif self.contains(input_word, cmd_word):
+                        inpt_word_has_match = True
+                        break
+                if not inpt_word_has_match:
+                    matching = False  # If there's an input word with no match in the command, it's not this command
+                    break
+            if matching:  # After all input words, there are none that don't match the command
+                matching_commands.append(command)
+        return matching_commands
+
+
+def command_index(commands):
+    """Returns the compiled index for the given commands, reusing it for as long as the same commands are in use."""
+    key = frozenset(commands)
+    if len(key) != len(commands):  # Duplicates change the sorted list, so key on it exactly
+        key = tuple(sorted(commands))
+    index = _command_indexes.get(key)
+    if index is None:
+        if len(_command_indexes) >= 64:
+            _command_indexes.pop(next(iter(_command_indexes)))  # Drop the oldest
+        index = _command_indexes[key] = CommandIndex(commands)
+    return index
 
 
 def find_command(inpt, commands=None, force_beginning=False, feedback=True):
@@ -166,13 +351,8 @@ def find_command(inpt, commands=None, force_beginning=False, feedback=True):
     parts = utils.split_with_quotes(inpt)
     primary_command = parts[0]
 
-    sorted_commands = sorted(commands)
-    sorted_commands.insert(0, "help")
-    # Re-insert "back" at end of list
-    if "back" in sorted_commands:
-        sorted_commands.remove("back")
-        sorted_commands.append("back")
-    sorted_commands.append("quit")
+    index = command_index(commands)
+    sorted_commands = index.commands
 
     if inpt == "" or inpt == '""':
         if feedback:
@@ -181,91 +361,15 @@ def find_command(inpt, commands=None, force_beginning=False, feedback=True):
 
     # <editor-fold desc="Find matching commands">
     # Match to words that begin with the input first, then attempt to match to the middle of words
-    # Startswith Matching
-    matching_commands = []
     input_words = primary_command.split()
     # If only one word, that is the primary command
     if len(input_words) == 0:
         input_words[0] = primary_command
 
-    # TODO: Can any of this be abstracted out?
-
-    for command in sorted_commands:
-        matching = True
-        remaining_command = command # This will shrink as words are matched
-
-        while matching: # Until this command is demonstrated not to match the input
-            # If there are too many words in the input, this command does not match
-            if len(input_words) > len(command.split()):
-                matching = False
-                break
-
-            for input_word in input_words:
-                if not matching:
-                    break
-                inpt_word_has_match = False
-                # Try to match the next word in the input to any word in the remaining command
-                for cmd_word in remaining_command.split():
-                    # If 3 or fewer letters are used, or we've forced matching to the beginning of words only
-                    if len(input_word) < 4 or force_beginning:
-                        if cmd_word.startswith(input_word):
-                            inpt_word_has_match = True
-                            #
-                            try:
-                                remaining_command = command.split(cmd_word)[1]
-                            except IndexError:
-                                remaining_command = command.split(cmd_word)[0]
-                            break
-                    else:
-                        # Check if the input word is anywhere in the command word
-                        pattern = r"\s*".join(input_word)
-                        if re.search(pattern, cmd_word):
-                            inpt_word_has_match = True
-                            break
-                # If any input word does not get a match, this isn't the command
-                if not inpt_word_has_match:
-                    matching = False
-                    break
-
-            if matching:
-                matching_commands.append(command)
-                break
-
+    matching_commands = index.startswith_matches(input_words, force_beginning)
     # Mid-word matching - If it hasn't already matched to startswith, match to any part of commands
     if not matching_commands:
-        for command in sorted_commands:
-            matching = True
-            remaining_command = command
-
-            while matching:
-                # If there are too many words in the input, this command does not match
-                if len(input_words) > len(command.split()):
-                    matching = False
-                for input_word in input_words:
-                    if not matching:
-                        break
-                    inpt_word_has_match = False
-                    for cmd_word in remaining_command.split():
-                        # Match to beginning of word if <3 letters given
-                        if len(input_word) < 3:
-                            if cmd_word.startswith(input_word):
-                                inpt_word_has_match = True
-                                try:
-                                    remaining_command = command.split(f"{cmd_word} ")[1]
-                                except IndexError:
-                                    remaining_command = command.split(cmd_word)[0]
-                                break
-                        else:
-                            pattern = r"\s*".join(input_word)
-                            if re.search(pattern, cmd_word):
-                                inpt_word_has_match = True
-                                break
-                    if not inpt_word_has_match:
-                        matching = False  # If there's an input word with no match in the command, it's not this command
-                        break
-                if matching:  # After all input words, there are none that don't match the command
-                    matching_commands.append(command)
-                    break
+        matching_commands = index.midword_matches(input_words)
 
     # </editor-fold>
 
@@ -373,7 +477,8 @@ def parse_input(prompt=None, commands=None, force_beginning: bool = False, inpt=
         return primary_command, args
 
 
-def input_loop(prompt: str, commands, force_beginning=False, skip: str = None, ingredient=None, bar=None):
+def input_loop(prompt: str, commands, force_beginning=False, skip: str = None, ingredient=None, bar=None,
+               search_items=None):
     """
     Loops the prompt checking for the success of certain commands so feedback can be shown without
     re-drawing the entire screen.
@@ -384,11 +489,35 @@ def input_loop(prompt: str, commands, force_beginning=False, skip: str = None, i
     :param skip: This command's checker will not be called, e.g. distinguishing "new" cocktail from "new" game
     :param ingredient: Current context ingredient/type where needed for command checkers.
     :param bar: Current context bar where needed for command checkers.
+    :param search_items: Optional ingredients to suggest the closest matches from when input doesn't match a command.
+    A clear closest match is used in place of the input, otherwise the next input can pick a suggestion by its number.
     :return: The primary command and any args, whether or not a command checker has executed
     """
+    suggestions = []  # Ingredients last suggested, which the next input can pick by number
+    next_inpt = None  # Input to use instead of asking, i.e. a clear closest match
     while True:
-        inpt = parse_input(prompt=prompt, commands=commands, force_beginning=force_beginning)
+        from_suggestion = next_inpt is not None
+        if next_inpt is None:
+            raw_inpt = console.input(f"[prompt]{prompt}:[/prompt][white] > ").strip().lower()
+        else:
+            raw_inpt, next_inpt = next_inpt, None
+        if raw_inpt == "":
+            continue
+        if raw_inpt.isdigit() and 0 < int(raw_inpt) <= len(suggestions):
+            raw_inpt = unidecode(suggestions[int(raw_inpt) - 1].name.lower())
+            from_suggestion = True
+        suggestions = []
+        inpt = parse_input(prompt=prompt, commands=commands, force_beginning=force_beginning, inpt=raw_inpt)
         if inpt[0] is None:
+            # Suggest matches for typed input, but not for a suggestion that didn't resolve, so this can't loop
+            if search_items and not from_suggestion:
+                results = suggest_ingredients(raw_inpt, search_items, commands)
+                match = clear_match(results)
+                if match is not None:
+                    console.print(f"Using closest match: {match.format_name()}")
+                    next_inpt = unidecode(match.name.lower())
+                else:
+                    suggestions = [ingredient for ingredient, score in results]
             continue
         primary_cmd, args = inpt
 
@@ -440,6 +569,34 @@ def input_loop(prompt: str, commands, force_beginning=False, skip: str = None, i
         # <editor-fold desc="Command Functions">
 
 
+def suggest_ingredients(inpt, search_items, commands, k=5):
+    """
+    Finds the ingredients that best match input that didn't resolve to a single command, and prints them numbered
+    unless one is a clear match.
+
+    :param commands: The commands currently available; ingredients without one aren't suggested.
+    :return: The search results, as (ingredient, score) tuples, best match first.
+    """
+    results = search.catalog_search().search(inpt, k=k, within=search_items)
+    results = [(ingredient, score) for ingredient, score in results if unidecode(ingredient.name.lower()) in commands]
+    logger.log(f"Search results for '{inpt}': {[(ingredient.name, score) for ingredient, score in results]}")
+    if results and clear_match(results) is None:
+        matches = ", ".join(f"{number}. {ingredient.format_name()}"
+                            for number, (ingredient, score) in enumerate(results, start=1))
+        console.print(f"Closest matches: {matches}  [prompt](enter a number to pick one)")
+    return results
+
+
+def clear_match(results):
+    """
+    Returns the top search result if it's the only one, or it scored at least clear_match_ratio times the next best,
+    else None.
+    """
+    if len(results) == 1 or (len(results) > 1 and results[0][1] >= results[1][1] * clear_match_ratio):
+        return results[0][0]
+    return None
+
+
 # <editor-fold desc="Input Loop Command Checkers">
 # These validate input for all commands, and check the success of many commands
 
@@ -579,9 +736,9 @@ def check_shop(args, bar, ingredient):
     if len(args) > 0:
         all_ingredient_types = ingredients.all_ingredient_types()
         # Attempt to match to singular, then to plural category names
-        shop_arg = find_command(args[0], [typ().format_type(plural=False).lower() for typ in all_ingredient_types])
+        shop_arg = find_command(args[0], [ingredients.type_info(typ).name.lower() for typ in all_ingredient_types])
         if not shop_arg:
-            shop_arg = find_command(args[0], [typ().format_type(plural=True).lower() for typ in all_ingredient_types])
+            shop_arg = find_command(args[0], [ingredients.type_info(typ).plural.lower() for typ in all_ingredient_types])
 
         if shop_arg:
             shop_typ = command_to_item(shop_arg, all_ingredient_types, plural=True)
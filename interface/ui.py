@@ -171,7 +171,7 @@ def menu_screen(bar):
             menu_commands = menu_commands.union(items_to_commands(menu_list, plural_types=True))
         else:
             menu_commands = menu_commands.union(
-                items_to_commands(bar.menu.get_section(type_displaying()), plural_types=True))
+                items_to_commands(bar.menu.get_command_names(type_displaying), plural_types=True))
             logger.log("Bar menu screen drawn - viewing " + type_displaying().format_type())
 
         typ = None if type_displaying is None else type_displaying
@@ -373,7 +373,8 @@ def shop_screen(bar, current_selection: type or Ingredient = Ingredient, msg=Non
         force_beginning = True if current_selection == Drink else False
 
         primary_cmd, args = input_loop(prompt=prompt, commands=shop_commands, force_beginning=force_beginning,
-                                       ingredient=current_selection, bar=bar, skip="shop")
+                                       ingredient=current_selection, bar=bar, skip="shop",
+                                       search_items=[item for item in shop_list if isinstance(item, Ingredient)])
 
         if msg:
             msg = None
@@ -425,6 +426,8 @@ def play_screen(bar, start_game_minutes):
                             border_style=console.get_style("cstmr"))
     balance_panel = Panel(renderable=f"Balance: [money]${"{:.2f}".format(bar.bar_stats.balance)}",
                           border_style=console.get_style("money"))
+    if bar.occupancy.archiving_enabled():
+        bar.occupancy.archive_event_log(utils.event_log_path(bar))
     log_panel = bar.occupancy.event_log_panel()
     customers_panel = Panel(title=f"Customers ({len(bar.occupancy.current_customers())})",
                             renderable=bar.occupancy.print_customers(), style=console.get_style("cstmr"))
@@ -448,17 +451,30 @@ def play_screen(bar, start_game_minutes):
         time_paused = clock.run_clock(bar=bar, start_game_mins=start_game_minutes, clock_panel=clock_panel,
                                       layout=play_layout)
 
-        if time_paused > 26 * 60:
+        if time_paused >= bar.occupancy.closing_time:
             bar.set_screen("MAIN")
             return
 
         # Set all current customers as commands
         customer_names = [cstmr.name.lower() for cstmr in bar.occupancy.current_customers()]
-        commands = customer_names + ["resume"]
+        commands = customer_names + ["resume", "speed", "archive"]
 
-        primary_cmd, args = input_loop(prompt="Type a customer name for details, or 'resume'", commands=commands)
+        primary_cmd, args = input_loop(prompt="Type a customer name for details, 'speed', 'archive', or 'resume'",
+                                       commands=commands)
         if primary_cmd in customer_names:
             bar.occupancy.customer_displayed = bar.occupancy.get_customer(primary_cmd)
+        elif primary_cmd == "speed":
+            speed_cmd = input_loop(prompt=f"Choose a speed (currently {bar.get_clock().speed_label()})",
+                                   commands=list(clock.speeds))[0]
+            bar.get_clock().set_speed(clock.speeds[speed_cmd])
+            logger.log(f"Game speed set to {speed_cmd}")
+        elif primary_cmd == "archive":
+            archive_path = utils.event_log_path(bar)
+            bar.occupancy.set_archiving(not bar.occupancy.archiving_enabled(), archive_path)
+            if bar.occupancy.archiving_enabled():
+                logger.logprint(f"Archiving the event log to {archive_path}")
+            else:
+                logger.logprint("Stopped archiving the event log")
         elif primary_cmd == "resume":
             pass
 
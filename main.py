@@ -1,6 +1,6 @@
 from utility import utils
 from data.ingredients import load_ingredients_from_db, all_ingredients, MenuItem
-from interface import ui
+from interface import ui, commands
 from display.rich_console import console
 
 if utils.debugging():
@@ -8,6 +8,7 @@ if utils.debugging():
     console.size = 120, height
 
 load_ingredients_from_db()
+commands.command_names(all_ingredients)  # Build the catalog's command lookups up front
 
 for ingredient in all_ingredients:
     console.print(f"{ingredient.format_name()} ({ingredient.format_type()})")
@@ -5,7 +5,7 @@ from rich.table import Table
 from rich.text import Text
 
 from data import ingredients, flavors
-from data.ingredients import Ingredient, MenuItem
+from data.ingredients import Ingredient, MenuItem, type_info
 from display import rich_console
 from display.rich_console import console, standardized_spacing
 from utility import logger
@@ -13,6 +13,49 @@ from utility import logger
 
 # TODO Specify ingredients like Coffee liqueur
 
+class RecipePlan:
+    """
+    A recipe's ingredients resolved once into flat lists, one entry per slot - fluid ounces poured, highest price per
+    ounce and ABV - so pricing, ABV and pouring don't look portions up through the ingredient classes every time.
+    """
+
+    def __init__(self, r_ingredients):
+        r_ingredients = r_ingredients or {}
+        self.signature = tuple(r_ingredients.items())  # Matches Recipe.taste_signature, to tell when it's stale
+        self.slots = list(r_ingredients)  # Specific ingredients, or types that accept any ingredient of the type
+        self.portions = list(r_ingredients.values())
+        self.type_slots = [isinstance(slot, type) for slot in self.slots]
+        self.volumes = []
+        self.prices_per_oz = []  # 0 for type slots, whose price depends on the ingredient poured
+        self.abvs = []  # None for slots without an ABV
+        for slot, portion, is_type in zip(self.slots, self.portions, self.type_slots):
+            if is_type:
+                self.volumes.append(type_info(slot).portions[portion])
+                self.prices_per_oz.append(0)
+            else:
+                if not isinstance(slot, Ingredient):
+                    console.print("[error]Recipe plan received an ingredient not registering as type or ingredient")
+                self.volumes.append(slot.get_portions()[portion])
+                self.prices_per_oz.append(slot.price_per_oz("max"))
+            self.abvs.append(slot.abv if hasattr(slot, "abv") else None)
+
+        self.cost_value = 0
+        for volume, price_per_oz in zip(self.volumes, self.prices_per_oz):
+            self.cost_value += volume * price_per_oz
+        self.variable = any(self.type_slots)
+
+        total_alcohol_fl_oz = 0
+        for volume, abv in zip(self.volumes, self.abvs):
+            if abv is not None:
+                total_alcohol_fl_oz += volume * (abv / 100)
+        total_volume_fl_oz = sum(self.volumes)
+        self.abv = (total_alcohol_fl_oz / total_volume_fl_oz) * 100 if total_volume_fl_oz else 0
+
+    def pours(self):
+        """Yields each slot with the fluid ounces it takes."""
+        return zip(self.slots, self.volumes)
+
+
 class Recipe(MenuItem):
     def __init__(self, name=None, r_ingredients: dict[type[Ingredient] or Ingredient, str] = None):
         super().__init__()
@@ -22,6 +65,14 @@ class Recipe(MenuItem):
         self.markup = 0.0
         self.markdown = 0.0
         self.formatted_markdown = ""
+        self.plan = None
+
+    def get_plan(self):
+        """Returns the recipe's compiled plan, compiling it again if its ingredients have changed since."""
+        plan = getattr(self, "plan", None)  # Recipes from older saves have no plan yet
+        if plan is None or plan.signature != self.taste_signature():
+            self.plan = RecipePlan(self.r_ingredients)
+        return self.plan
 
     def format_name(self, capitalize=False):
         style = self.get_style()
@@ -87,18 +138,8 @@ class Recipe(MenuItem):
     # <editor-fold desc="Price">
     @override
     def cost_value(self):
-        cost_value = 0
-        variable = False
-        for r_ingredient in self.r_ingredients:
-            if isinstance(r_ingredient, type):
-                cost_value += 0
-                variable = True
-            elif isinstance(r_ingredient, Ingredient):
-                portion = r_ingredient.get_portions()[self.r_ingredients[r_ingredient]]
-                cost_value += portion * r_ingredient.price_per_oz("max")
-            else:
-                console.print("[error]Recipe cost value received an ingredient not registering as type or ingredient")
-        return cost_value, variable
+        plan = self.get_plan()
+        return plan.cost_value, plan.variable
 
     @override
     def profit_base(self):
@@ -133,10 +174,11 @@ class Recipe(MenuItem):
         r_ings = []
         for entry in self.r_ingredients:
             if isinstance(entry, type):
+                info = type_info(entry)
                 if markup:
-                    r_ings.append(f"[{entry().get_style()}]{entry().format_type()}")
+                    r_ings.append(f"[{info.style}]{info.name}")
                 else:
-                    r_ings.append(entry().format_type())
+                    r_ings.append(info.name)
             elif isinstance(entry, Ingredient):
                 if markup:
                     r_ings.append(f"[{entry.get_style()}]{entry.name}")
@@ -168,7 +210,8 @@ class Recipe(MenuItem):
         money_style = console.get_style("money")
 
         if len(self.r_ingredients) > 0:
-            for ingredient in self.r_ingredients:
+            plan = self.get_plan()
+            for ingredient, volume, price_per_oz in zip(plan.slots, plan.volumes, plan.prices_per_oz):
                 if self.r_ingredients[ingredient] in ["Crushed", "Whole"]:
                     of = ""
                 elif self.r_ingredients[ingredient] in ["On the Rim"]:
@@ -177,15 +220,13 @@ class Recipe(MenuItem):
                     of = "of"
 
                 if isinstance(ingredient, type):
-                    obj = ingredient()
-                    name = obj.format_type()
-                    style = obj.get_style()
+                    name = type_info(ingredient).name
+                    style = type_info(ingredient).style
                     cost = "?"
                 else:
                     name = ingredient.name
                     style = ingredient.get_style()
-                    cost = "~${:.2f}".format(
-                        ingredient.get_portions()[self.r_ingredients[ingredient]] * ingredient.price_per_oz("max"))
+                    cost = "~${:.2f}".format(volume * price_per_oz)
 
                 recipe_table.add_row(f"-   {self.r_ingredients[ingredient]}", of, Text(name, style),
                                      Text(cost, money_style))
@@ -204,28 +245,13 @@ class Recipe(MenuItem):
     # <editor-fold desc="Calculations">
     def calculate_abv(self):
         """Calculates the ABV of the recipe using ingredient ABVs."""
-        total_alcohol_fl_oz = 0
-        total_volume_fl_oz = 0
-
-        for ingredient, portion in self.r_ingredients.items():
-            if isinstance(ingredient, Ingredient):
-                obj = ingredient
-            elif isinstance(ingredient, type):
-                obj = ingredient()
-
-            fl_oz = obj.get_portions()[portion]
+        return self.get_plan().abv
 
-            if hasattr(ingredient, "abv"):
-                alcohol_fl_oz = fl_oz * (ingredient.abv / 100)
-                total_alcohol_fl_oz += alcohol_fl_oz
-
-            total_volume_fl_oz += fl_oz
-
-        if total_volume_fl_oz == 0:
-            return 0
-
-        abv = (total_alcohol_fl_oz / total_volume_fl_oz) * 100
-        return abv
+    @override
+    def taste_signature(self):
+        if not self.r_ingredients:
+            return ()
+        return tuple(self.r_ingredients.items())
 
     def generate_taste_profile(self):
         """
@@ -238,7 +264,7 @@ class Recipe(MenuItem):
             if isinstance(ingredient, type):
                 continue
 
-            logger.log(f"Generating taste profile for {self.name}:")
+            logger.trace("recipe", "Generating taste profile for %s:", self.name)
 
             volume = round(Decimal(ingredient.get_portions()[self.r_ingredients[ingredient]]), 2)
 
@@ -258,7 +284,7 @@ class Recipe(MenuItem):
                 except KeyError:
                     taste_profile[taste] = Decimal()
                     taste_profile[taste] += points
-                logger.log(f"    {points} points in {taste} from {ingredient.name}")
+                logger.trace("recipe", "    %s points in %s from %s", points, taste, ingredient.name)
 
         sorted_taste_profile = dict(sorted(taste_profile.items(), key=lambda x: x[1], reverse=True))
         return sorted_taste_profile
@@ -280,6 +306,7 @@ class Recipe(MenuItem):
 
 def create_recipe(name=None, r_ingredients: dict[type[Ingredient] or Ingredient, str] = None):
     recipe = Recipe(name, r_ingredients)
+    recipe.plan = RecipePlan(r_ingredients)
     recipe.taste_profile = recipe.generate_taste_profile()
     return recipe
 
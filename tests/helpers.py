@@ -0,0 +1,42 @@
+import recipe
+from data import ingredients
+from data.ingredients import Beer, Bourbon, Gin, Wine, get_ingredient
+from interface import ui  # Imported before bar_pkg.bar, as main.py does, to settle their circular imports
+from bar_pkg.bar import Bar
+
+
+def load_catalog():
+    """Loads the ingredient catalog once for the whole test run."""
+    if not ingredients.all_ingredients:
+        ingredients.load_ingredients_from_db()
+
+
+def make_bar(balance=5000):
+    """
+    Builds a small stocked bar with beers, wines and two cocktails on the menu, for simulating days against.
+
+    :return: The Bar.
+    """
+    load_catalog()
+    bar = Bar("Test Tavern", balance=balance)
+    beers = [ingredient for ingredient in ingredients.all_ingredients if isinstance(ingredient, Beer)][:8]
+    wines = [ingredient for ingredient in ingredients.all_ingredients if type(ingredient) is not Wine
+             and isinstance(ingredient, Wine)][:4]
+    for item in beers + wines:
+        bar.stock.set_volume(item, max(item.volumes) * 2)
+        bar.menu.add(item)
+
+    bourbon = ingredients.list_ingredients(typ=Bourbon)[0]
+    gin = ingredients.list_ingredients(typ=Gin)[0]
+    for ingredient in (bourbon, gin, get_ingredient("lemon"), get_ingredient("simple syrup")):
+        bar.stock.set_volume(ingredient, 64)
+    cocktails = [
+        recipe.create_recipe("Whiskey Sour", {Bourbon: "Shot", get_ingredient("lemon"): "Juice (1oz)",
+                                              get_ingredient("simple syrup"): "Half ounce"}),
+        recipe.create_recipe("Gin Sour", {gin: "Shot", get_ingredient("lemon"): "Juice (1oz)",
+                                          get_ingredient("simple syrup"): "Half ounce"}),
+    ]
+    for cocktail in cocktails:
+        bar.recipes[cocktail.name] = cocktail
+        bar.menu.add(cocktail)
+    return bar
@@ -0,0 +1,131 @@
+import unittest
+from unittest import mock
+
+from tests.helpers import load_catalog, make_bar
+import customer
+from data import ingredients
+from data.ingredients import Beer
+from interface import commands
+
+
+class CommandNamesTest(unittest.TestCase):
+    def setUp(self):
+        load_catalog()
+
+    def test_catalog_names_rebuilt_when_catalog_changes(self):
+        names = commands.command_names(ingredients.all_ingredients)
+        self.assertIs(commands.command_names(ingredients.all_ingredients), names)
+        ingredients.catalog_changed()
+        self.assertIsNot(commands.command_names(ingredients.all_ingredients), names)
+
+    def test_menu_names_follow_menu_changes(self):
+        bar = make_bar()
+        item = bar.menu.beer[0]
+        command = commands.unidecode(item.name.lower())
+        self.assertIs(commands.command_to_item(command, bar.menu.get_command_names()), item)
+
+        bar.menu.get_section(item).remove(item)
+        bar.menu.menu_changed()
+        self.assertIsNone(commands.command_to_item(command, bar.menu.get_command_names()))
+
+        bar.menu.add(item)
+        self.assertIs(commands.command_to_item(command, bar.menu.get_command_names()), item)
+        self.assertIn(command, commands.items_to_commands(bar.menu.get_command_names(Beer)))
+
+    def test_remove_after_sellout(self):
+        bar = make_bar()
+        for section, name, typ in bar.menu.list_menu_by_section():
+            if typ is not Beer:
+                section.clear()
+        bar.menu.menu_changed()
+        sold_out = bar.menu.beer[0]
+        bar.menu.get_command_names()  # Names built while it was still on the menu
+
+        cstmr = customer.Customer(bar)
+        cstmr.generate_customer_data()
+        cstmr.drink_pref = Beer
+        cstmr.say = lambda game_time, msg: None
+        cstmr.choose_order(bar, bar.occupancy.opening_time, exclude={sold_out})
+        self.assertNotIn(sold_out, bar.menu.beer)
+
+        with mock.patch.object(commands.console, "print"):
+            self.assertFalse(bar.menu.remove(f'"{sold_out.name.lower()}"'))
+        self.assertIsNone(commands.command_to_item(commands.unidecode(sold_out.name.lower()),
+                                                   bar.menu.get_command_names()))
+
+    def test_command_with_args_names_no_item(self):
+        cmd = commands.find_command("buy 10", {"buy", "back"}, feedback=False)
+        self.assertEqual(cmd, ("buy", ["10"]))
+        self.assertIsNone(commands.command_to_item(cmd, ["buy", "back"]))
+        self.assertIsNone(commands.command_to_item(None, ["buy", "back"]))
+
+
+class CommandIndexTest(unittest.TestCase):
+    commands = {"lime", "lime juice", "lemon", "lemon juice", "patron silver", "patron reposado", "back", "finish",
+                "shop", "buy", "grenadine", "green chartreuse"}
+
+    def find(self, inpt, force_beginning=False):
+        return commands.find_command(inpt, self.commands, force_beginning=force_beginning, feedback=False)
+
+    def test_order(self):
+        index = commands.command_index(self.commands)
+        self.assertEqual(index.commands[0], "help")
+        self.assertEqual(index.commands[-2:], ["back", "quit"])
+        self.assertEqual(index.commands[1:-2], sorted(self.commands - {"back"}))
+
+    def test_index_reused_for_same_commands(self):
+        self.assertIs(commands.command_index(set(self.commands)), commands.command_index(list(self.commands)))
+        self.assertIsNot(commands.command_index(self.commands), commands.command_index(self.commands | {"menu"}))
+
+    def test_matches(self):
+        expected = {"lime": "lime", "lim": "lime", "lemon jui": "lemon", "sil": "patron silver",
+                    "reposado": "patron reposado", "fin": "finish", "gren": "grenadine", "char": "green chartreuse",
+                    "h": "help", "q": "quit", "buy 10": ("buy", ["10"]), 'shop "lime"': ("shop", ["lime"])}
+        for inpt, command in expected.items():
+            for force_beginning in (False, True):
+                self.assertEqual(self.find(inpt, force_beginning), command, inpt)
+
+    def test_no_single_match(self):
+        for inpt in ("juice", "patron", "pat sil", "gre", "xyz", "tron"):
+            self.assertIsNone(self.find(inpt), inpt)
+
+    def test_candidates_cover_every_match(self):
+        index = commands.command_index(self.commands)
+        for inpt in ("li", "juice", "on", "sil", "ver", "re"):
+            candidates = {index.commands[position] for position in index.candidates([inpt], 4)}
+            brute_force = {command for command in index.commands
+                           if any(word.startswith(inpt) if len(inpt) < 4 else inpt in word for word in command.split())}
+            self.assertEqual(candidates, brute_force, inpt)
+
+
+class SuggestionTest(unittest.TestCase):
+    def setUp(self):
+        load_catalog()
+        self.cmds = commands.items_to_commands(ingredients.all_ingredients) | {"back", "finish"}
+
+    def run_loop(self, *inputs):
+        """Runs input_loop over the catalog with the given inputs typed in, returning the command and prompt count."""
+        with mock.patch.object(commands.console, "input", side_effect=inputs) as typed, \
+                mock.patch.object(commands.console, "print"):
+            result = commands.input_loop("Test", self.cmds, search_items=ingredients.all_ingredients)
+        return result, typed.call_count
+
+    def test_clear_match_is_used(self):
+        (cmd, args), prompts = self.run_loop("patron silvr")
+        self.assertEqual(cmd, "patron silver")
+        self.assertEqual(prompts, 1)
+
+    def test_pick_suggestion_by_number(self):
+        results = commands.search.catalog_search().search("wisky")
+        self.assertIsNone(commands.clear_match(results))
+        (cmd, args), prompts = self.run_loop("wisky", "2")
+        self.assertEqual(cmd, commands.unidecode(results[1][0].name.lower()))
+        self.assertEqual(prompts, 2)
+
+    def test_numbers_only_pick_after_suggestions(self):
+        (cmd, args), prompts = self.run_loop("2", "back")
+        self.assertEqual(cmd, "back")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+import customer
+from data import ingredients
+from display.rich_console import console
+from tests.helpers import make_bar
+
+
+class FavoriteSpiritTest(unittest.TestCase):
+    def setUp(self):
+        self.bar = make_bar()
+        self.gin_sour = self.bar.recipes["Gin Sour"]
+        self.cstmr = customer.Customer(self.bar)
+        self.cstmr.generate_customer_data()
+        self.cstmr.fav_spirit = ingredients.Gin
+        self.said = []
+        self.cstmr.say = lambda game_time, msg: self.said.append(msg)
+
+    def spirit_lines(self):
+        # Other lines can name the drink itself
+        return [msg for msg in self.said if "Gin" in msg.replace("Gin Sour", "")]
+
+    def test_revealed_once(self):
+        self.assertFalse(self.cstmr.is_revealed(ingredients.Gin))
+        self.cstmr.score_flavors(0, self.gin_sour, drinking=True)
+        self.assertTrue(self.cstmr.is_revealed(ingredients.Gin))
+        self.assertIs(self.cstmr.revealed_favs["Favorite spirit"], ingredients.Gin)
+        self.assertEqual(len(self.spirit_lines()), 1)
+
+        self.cstmr.score_flavors(0, self.gin_sour, drinking=True)
+        self.assertEqual(len(self.spirit_lines()), 1)
+
+    def test_not_revealed_without_drinking(self):
+        self.cstmr.score_flavors(0, self.gin_sour)
+        self.assertFalse(self.cstmr.is_revealed(ingredients.Gin))
+        self.assertEqual(self.said, [])
+
+    def test_panel_shows_revealed_spirit(self):
+        self.cstmr.score_flavors(0, self.gin_sour, drinking=True)
+        with console.capture() as capture:
+            console.print(self.cstmr.customer_panel())
+        self.assertIn("Gin", capture.get())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import customer
+import customer_scoring
+from bar_pkg.rng import SimulationRNG
+from tests.helpers import make_bar
+
+
+@unittest.skipIf(customer_scoring.np is None, "NumPy is not installed")
+class RoundScoresTest(unittest.TestCase):
+    def setUp(self):
+        self.bar = make_bar()
+        self.menu = self.bar.menu.list_full_menu()
+        self.customers = []
+        for _ in range(20):
+            cstmr = customer.Customer(self.bar)
+            cstmr.generate_customer_data()
+            self.customers.append(cstmr)
+
+    def test_matches_sequential_scores(self):
+        batch = customer_scoring.round_scores(self.customers, self.menu)
+        for cstmr in self.customers:
+            for item in self.menu:
+                self.assertAlmostEqual(batch[cstmr][item], float(cstmr.score_flavors(0, item)), places=1)
+
+    def test_same_top_items(self):
+        batch = customer_scoring.round_scores(self.customers, self.menu)
+        for cstmr in self.customers:
+            sequential = {item: cstmr.score_flavors(0, item) for item in self.menu}
+            by_batch = sorted(self.menu, key=lambda item: -batch[cstmr][item])[:3]
+            by_sequential = sorted(self.menu, key=lambda item: -sequential[item])[:3]
+            self.assertEqual([round(batch[cstmr][item], 1) for item in by_batch],
+                             [round(float(sequential[item]), 1) for item in by_sequential])
+            self.assertEqual(set(by_batch), set(by_sequential))
+
+    def test_scores_are_floats(self):
+        batch = customer_scoring.round_scores(self.customers, self.menu)
+        self.assertIsInstance(next(iter(batch[self.customers[0]].values())), float)
+
+    def test_same_orders_with_batch_scores(self):
+        batch = customer_scoring.round_scores(self.customers, self.menu)
+        for cstmr in self.customers:
+            cstmr.say = lambda game_time, msg: None
+            orders = []
+            for scores in (None, batch[cstmr]):
+                self.bar.occupancy.rng = SimulationRNG(cstmr.name)
+                cstmr.comments_made = set()
+                orders.append(cstmr.choose_order(self.bar, 960, precomputed_scores=scores))
+            self.assertIs(orders[0], orders[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
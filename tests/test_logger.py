@@ -0,0 +1,32 @@
+import os
+import unittest
+
+from utility import logger
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "Processes can't be forked here")
+class ForkedLogTest(unittest.TestCase):
+    def test_forked_process_logs_to_own_file(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                logger.log("Logged from the forked process")
+                logger.file_handler.close()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        child_log = logger.process_filename(pid)
+        self.assertTrue(os.path.exists(child_log))
+        with open(child_log) as file:
+            self.assertIn("Logged from the forked process", file.read())
+        os.remove(child_log)
+
+        logger.queue_listener.stop()  # Writes out anything still queued
+        logger.queue_listener.start()
+        with open(logger.filename) as file:
+            self.assertNotIn("Logged from the forked process", file.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
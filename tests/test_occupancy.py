@@ -0,0 +1,114 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from tests.helpers import make_bar
+from bar_pkg import occupancy
+from utility import logger, utils
+
+
+class EventLogTest(unittest.TestCase):
+    def setUp(self):
+        self.bar = make_bar()
+        self.occupancy = self.bar.occupancy
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "events.log")
+
+    def tearDown(self):
+        self.occupancy.archive_event_log(None)
+        self.folder.cleanup()
+
+    def test_log_keeps_only_visible_lines(self):
+        for number in range(self.occupancy.event_log_lines() + 10):
+            self.occupancy.print_msg(f"Message {number}")
+        self.assertEqual(len(self.occupancy.get_event_log()), self.occupancy.event_log_lines())
+        self.assertEqual(self.occupancy.get_event_log()[-1], f"Message {self.occupancy.event_log_lines() + 9}")
+
+    def test_panel_rebuilt_only_for_new_lines(self):
+        self.occupancy.print_msg("First")
+        panel = self.occupancy.event_log_panel()
+        self.assertIs(self.occupancy.event_log_panel(), panel)
+        self.occupancy.print_msg("Second")
+        self.assertIsNot(self.occupancy.event_log_panel(), panel)
+
+    def test_archive_is_off_until_turned_on(self):
+        self.assertFalse(self.occupancy.archiving_enabled())
+        self.occupancy.print_msg("Not kept")
+        self.assertIsNone(self.occupancy.get_archive_handler())
+
+        self.occupancy.set_archiving(True, self.path)
+        self.assertTrue(self.occupancy.archiving_enabled())
+        self.occupancy.print_msg("Kept")
+        self.occupancy.set_archiving(False)
+        self.assertIsNone(self.occupancy.event_log_archive)
+        self.occupancy.print_msg("Not kept either")
+        with open(self.path, encoding="utf-8") as file:
+            self.assertEqual(file.read().splitlines(), ["Kept"])
+
+    def test_archive_path_is_under_logs(self):
+        path = utils.event_log_path(self.bar)
+        self.assertEqual(os.path.dirname(os.path.dirname(path)), logger.logs_dir)
+
+    def test_archive_keeps_full_history_through_one_file(self):
+        self.occupancy.archive_event_log(self.path)
+        for number in range(self.occupancy.event_log_lines() + 10):
+            self.occupancy.print_msg(f"Message {number}")
+        archive_handler = self.occupancy.archive_handler
+        self.occupancy.print_msg("Last")
+        self.assertIs(self.occupancy.archive_handler, archive_handler)
+
+        with open(self.path, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        self.assertEqual(len(lines), self.occupancy.event_log_lines() + 11)
+        self.assertEqual(lines[-1], "Last")
+
+    def test_archive_rolls_over_at_cap(self):
+        with mock.patch.object(occupancy, "archive_max_bytes", 100):
+            self.occupancy.archive_event_log(self.path)
+            for number in range(100):
+                self.occupancy.print_msg(f"Message {number:03}")
+        files = sorted(os.listdir(self.folder.name))
+        self.assertEqual(files, ["events.log"] + [f"events.log.{n}" for n in range(1, occupancy.archive_backup_count + 1)])
+        for file_name in files:
+            self.assertLessEqual(os.path.getsize(os.path.join(self.folder.name, file_name)), 100)
+        with open(self.path, encoding="utf-8") as file:
+            self.assertEqual(file.read().splitlines()[-1], "Message 099")
+
+    def test_end_day_closes_archive(self):
+        self.occupancy.archive_event_log(self.path)
+        self.occupancy.print_msg("Open")
+        archive_handler = self.occupancy.archive_handler
+        self.bar.end_day()
+        self.assertIsNone(archive_handler.stream)
+        self.assertIsNone(self.occupancy.event_log_archive)
+
+    def test_old_logs_deleted_around_archive_folder(self):
+        os.makedirs(os.path.join(self.folder.name, "events"))
+        for number in range(3):
+            with open(os.path.join(self.folder.name, f"{number}.log"), "w") as file:
+                file.write("log")
+            os.utime(os.path.join(self.folder.name, f"{number}.log"), (number, number))
+        logger.delete_oldest_log(self.folder.name, 2)
+        self.assertEqual(sorted(os.listdir(self.folder.name)), ["1.log", "2.log", "events"])
+
+    def test_save_leaves_out_panel_and_archive_handler(self):
+        self.occupancy.archive_event_log(self.path)
+        self.occupancy.print_msg("Saved")
+        self.occupancy.event_log_panel()
+
+        loaded = pickle.loads(pickle.dumps(self.bar)).occupancy
+        self.assertIsNone(loaded.log_panel)
+        self.assertIsNone(loaded.archive_handler)
+        self.assertEqual(list(loaded.get_event_log()), list(self.occupancy.get_event_log()))
+        # The saved bar still archives, reopening the file when next needed
+        loaded.print_msg("Loaded")
+        loaded.archive_event_log(None)
+        self.occupancy.archive_event_log(None)
+        with open(self.path, encoding="utf-8") as file:
+            self.assertEqual(file.read().splitlines(), ["Saved", "Loaded"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from tests.helpers import load_catalog
+import recipe
+from data import ingredients
+from data.ingredients import Bourbon, Gin, get_ingredient, type_info
+
+
+class RecipePlanTest(unittest.TestCase):
+    def setUp(self):
+        load_catalog()
+        self.gin = ingredients.list_ingredients(typ=Gin)[0]
+        self.lemon = get_ingredient("lemon")
+        self.syrup = get_ingredient("simple syrup")
+        self.gin_sour = recipe.create_recipe("Gin Sour", {self.gin: "Shot", self.lemon: "Juice (1oz)",
+                                                          self.syrup: "Half ounce"})
+        self.whiskey_sour = recipe.create_recipe("Whiskey Sour", {Bourbon: "Shot", self.lemon: "Juice (1oz)",
+                                                                  self.syrup: "Half ounce"})
+
+    def test_slots_resolve_portions(self):
+        plan = self.whiskey_sour.get_plan()
+        self.assertEqual(plan.slots, [Bourbon, self.lemon, self.syrup])
+        self.assertEqual(plan.type_slots, [True, False, False])
+        self.assertEqual(plan.volumes, [type_info(Bourbon).portions["Shot"], self.lemon.get_portions()["Juice (1oz)"],
+                                        self.syrup.get_portions()["Half ounce"]])
+        self.assertEqual(list(plan.pours()), list(zip(plan.slots, plan.volumes)))
+
+    def test_cost_and_abv(self):
+        plan = self.gin_sour.get_plan()
+        expected_cost = sum(ingredient.get_portions()[portion] * ingredient.price_per_oz("max")
+                            for ingredient, portion in self.gin_sour.r_ingredients.items())
+        self.assertAlmostEqual(plan.cost_value, expected_cost)
+        self.assertEqual(self.gin_sour.cost_value(), (plan.cost_value, False))
+
+        volumes = [ingredient.get_portions()[portion] for ingredient, portion in self.gin_sour.r_ingredients.items()]
+        alcohol = volumes[0] * self.gin.abv / 100
+        self.assertAlmostEqual(self.gin_sour.calculate_abv(), alcohol / sum(volumes) * 100)
+
+    def test_type_slots_make_price_variable(self):
+        plan = self.whiskey_sour.get_plan()
+        self.assertTrue(plan.variable)
+        self.assertEqual(plan.prices_per_oz[0], 0)
+        self.assertTrue(self.whiskey_sour.cost_value()[1])
+
+    def test_plan_reused_until_ingredients_change(self):
+        plan = self.gin_sour.get_plan()
+        self.assertIs(self.gin_sour.get_plan(), plan)
+        grenadine = get_ingredient("grenadine")
+        self.gin_sour.r_ingredients[grenadine] = next(iter(grenadine.get_portions()))
+        replanned = self.gin_sour.get_plan()
+        self.assertIsNot(replanned, plan)
+        self.assertEqual(len(replanned.slots), 4)
+
+    def test_older_saves_get_a_plan(self):
+        del self.gin_sour.plan
+        self.assertEqual(self.gin_sour.get_plan().slots, [self.gin, self.lemon, self.syrup])
+
+    def test_empty_recipe(self):
+        plan = recipe.RecipePlan(None)
+        self.assertEqual((plan.cost_value, plan.abv, plan.variable), (0, 0, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from tests.helpers import load_catalog
+from data import ingredients, search
+from data.ingredients import Beer, Bourbon
+
+
+def names(results):
+    return [ingredient.name for ingredient, score in results]
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        load_catalog()
+        self.index = search.catalog_search()
+
+    def test_exact_name_first(self):
+        self.assertEqual(names(self.index.search("angostura"))[0], "Angostura")
+
+    def test_typos_and_accents(self):
+        self.assertEqual(names(self.index.search("patron silvr")), ["Patrón Silver"])
+        self.assertEqual(names(self.index.search("guiness"))[0], "Guinness Draught")
+
+    def test_parent_types_are_searchable(self):
+        # Bourbons only say "bourbon", but are found through their parent type
+        results = self.index.search("whiskey", k=50)
+        self.assertTrue(any(isinstance(ingredient, Bourbon) and "whiskey" not in ingredient.name.lower()
+                            for ingredient, score in results))
+
+    def test_every_word_must_match(self):
+        self.assertTrue(self.index.search("vodka lemon"))
+        self.assertEqual(self.index.search("vodka xyzzyq"), [])
+        self.assertEqual(self.index.search(""), [])
+        self.assertEqual(self.index.search("!!"), [])
+
+    def test_results_are_ranked_and_limited(self):
+        results = self.index.search("lemn", k=3)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][0].name, "lemon")
+        scores = [score for ingredient, score in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_within_limits_results(self):
+        beers = [ingredient for ingredient in ingredients.all_ingredients if isinstance(ingredient, Beer)]
+        results = self.index.search("dark", k=10, within=beers)
+        self.assertTrue(results)
+        for ingredient, score in results:
+            self.assertIsInstance(ingredient, Beer)
+
+    def test_matches_a_fresh_index(self):
+        fresh = search.SearchIndex(ingredients.all_ingredients)
+        for query in ("wisky", "lemon vodka", "bourbn", "gren chartreuse"):
+            self.assertEqual(self.index.search(query), fresh.search(query))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from tests.helpers import make_bar
+from bar_pkg import simulation
+from bar_pkg.rng import SimulationRNG
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Simulates a seeded day and prints everything it recorded, including what customers said
+simulate_day_script = """
+from tests.helpers import make_bar
+from bar_pkg import simulation
+report = simulation.simulate_day(make_bar(), seed=42, trace=True)
+print(repr((report.sales, report.stockouts, report.arrivals, report.departures, report.trace.strings,
+            list(report.trace.kinds), list(report.trace.items))))
+"""
+
+
+def draws(rng, stream, count=5):
+    """Draws the next few numbers from one of the context's streams."""
+    return [getattr(rng, stream).random() for _ in range(count)]
+
+
+def without_timing(summary):
+    """A day's summary without how long it took to simulate, which is all that can differ between replays."""
+    return {key: value for key, value in summary.items() if key != "real_secs"}
+
+
+class SimulationRNGTest(unittest.TestCase):
+    def test_same_seed_same_streams(self):
+        for stream in SimulationRNG.streams:
+            self.assertEqual(draws(SimulationRNG(42), stream), draws(SimulationRNG(42), stream))
+        self.assertNotEqual(draws(SimulationRNG(42), "ordering"), draws(SimulationRNG(43), "ordering"))
+
+    def test_streams_are_independent(self):
+        untouched = SimulationRNG("seed")
+        chatty = SimulationRNG("seed")
+        draws(chatty, "dialogue", 100)
+        self.assertEqual(draws(chatty, "ordering"), draws(untouched, "ordering"))
+        self.assertNotEqual(draws(SimulationRNG(1), "arrivals"), draws(SimulationRNG(1), "customers"))
+
+    def test_spawned_children_are_distinct_and_replayable(self):
+        parent = SimulationRNG(7)
+        first, second = parent.spawn("day 0"), parent.spawn("day 1")
+        self.assertEqual(first.seed, "7/day 0")
+        self.assertEqual(draws(first, "ordering"), draws(SimulationRNG(7).spawn("day 0"), "ordering"))
+        self.assertNotEqual(draws(parent.spawn("day 0"), "ordering"), draws(second, "ordering"))
+        self.assertNotEqual(draws(SimulationRNG(7), "ordering"), draws(parent.spawn("day 0"), "ordering"))
+
+    def test_fresh_seed_when_none_given(self):
+        self.assertNotEqual(SimulationRNG().seed, SimulationRNG().seed)
+
+
+class SeededDayTest(unittest.TestCase):
+    def test_same_seed_same_report(self):
+        first = simulation.simulate_day(make_bar(), seed=11)
+        second = simulation.simulate_day(make_bar(), seed=11)
+        self.assertEqual(first.seed, 11)
+        self.assertEqual(without_timing(first.summary()), without_timing(second.summary()))
+        self.assertEqual((first.sales, first.stockouts, first.arrivals, first.departures),
+                         (second.sales, second.stockouts, second.arrivals, second.departures))
+        self.assertGreater(len(first.sales), 0)
+
+    def test_report_seed_replays_the_day(self):
+        first = simulation.simulate_day(make_bar())
+        replay = simulation.simulate_day(make_bar(), seed=first.seed)
+        self.assertEqual(first.sales, replay.sales)
+
+    def test_same_days_for_any_number_of_workers(self):
+        bar = make_bar()
+        one = simulation.simulate_days(bar, 4, seed=3, workers=1)
+        two = simulation.simulate_days(bar, 4, seed=3, workers=2)
+        self.assertEqual(one.seeds, two.seeds)
+        self.assertEqual([without_timing(summary) for summary in one.summaries],
+                         [without_timing(summary) for summary in two.summaries])
+
+    def run_day(self, hash_seed):
+        env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+        result = subprocess.run([sys.executable, "-c", simulate_day_script], cwd=repo_dir, env=env,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout
+
+    def test_same_day_in_every_process(self):
+        # String hashing, and so set ordering, differs between these processes
+        self.assertEqual(self.run_day(1), self.run_day(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
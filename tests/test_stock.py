@@ -0,0 +1,101 @@
+import unittest
+
+from tests.helpers import make_bar
+from bar_pkg.stock import InventoryIndex
+from data import ingredients
+from data.ingredients import Beer, Bourbon, Gin, Spirit, Whiskey, get_ingredient
+
+
+class InventoryIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.bar = make_bar()
+        self.stock = self.bar.stock
+        self.bourbons = ingredients.list_ingredients(typ=Bourbon)[:3]
+
+    def test_groups_by_every_class(self):
+        index = self.stock.get_index()
+        bourbon = ingredients.list_ingredients(typ=Bourbon)[0]
+        for typ in (Bourbon, Whiskey, Spirit):
+            self.assertIn(bourbon, index.of_type(typ))
+        self.assertNotIn(bourbon, index.of_type(Gin))
+        self.assertEqual(set(index.of_type(Beer)), {item for item in self.stock.inventory if isinstance(item, Beer)})
+
+    def test_best_of_type_follows_set_volume(self):
+        first, second, third = self.bourbons
+        for bourbon, volume in zip(self.bourbons, (10, 20, 5)):
+            self.stock.set_volume(bourbon, volume)
+        self.assertIs(self.stock.get_index().best_of_type(Bourbon), second)
+        self.stock.set_volume(third, 30)  # Overtakes the best
+        self.assertIs(self.stock.get_index().best_of_type(Bourbon), third)
+        self.stock.set_volume(third, 1)  # The best goes down, so it's worked out again
+        self.assertIs(self.stock.get_index().best_of_type(Whiskey), second)
+        self.assertIsNone(InventoryIndex({}).best_of_type(Bourbon))
+
+    def test_matches_index_built_from_scratch(self):
+        for volume, bourbon in enumerate(self.bourbons):
+            self.stock.set_volume(bourbon, volume * 7 % 11)
+        self.stock.fulfil(self.bar.menu.list_full_menu())
+        fresh = InventoryIndex(self.stock.inventory)
+        index = self.stock.get_index()
+        for typ in (Bourbon, Whiskey, Spirit, Beer, Gin):
+            self.assertEqual(list(index.of_type(typ)), list(fresh.of_type(typ)))
+            best = index.best_of_type(typ)
+            self.assertEqual(self.stock.inventory[best], self.stock.inventory[fresh.best_of_type(typ)])
+
+    def test_older_saves_get_an_index(self):
+        del self.stock.index
+        self.assertIsInstance(self.stock.get_index(), InventoryIndex)
+        self.stock.inventory = dict(self.stock.inventory)  # A replaced inventory gets a new index
+        self.assertIs(self.stock.get_index().inventory, self.stock.inventory)
+
+
+class ServingsCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.bar = make_bar()
+        self.stock = self.bar.stock
+        self.whiskey_sour = self.bar.recipes["Whiskey Sour"]
+        self.gin_sour = self.bar.recipes["Gin Sour"]
+        self.beer = self.bar.menu.beer[0]
+
+    def counted(self, menu_item):
+        """Whether the menu item's servings are currently cached."""
+        return self.stock.get_servings_cache().get(menu_item) is not None
+
+    def test_counts_are_cached(self):
+        servings = self.stock.number_pourable(self.whiskey_sour)
+        self.assertGreater(servings, 0)
+        self.assertTrue(self.counted(self.whiskey_sour))
+        self.assertEqual(self.stock.number_pourable(self.whiskey_sour), servings)
+
+    def test_set_volume_invalidates_only_dependents(self):
+        for menu_item in (self.whiskey_sour, self.gin_sour, self.beer):
+            self.stock.number_pourable(menu_item)
+        gin = next(ingredient for ingredient in self.gin_sour.r_ingredients if isinstance(ingredient, Gin))
+        self.stock.set_volume(gin, 0)
+        self.assertFalse(self.counted(self.gin_sour))
+        self.assertTrue(self.counted(self.whiskey_sour))
+        self.assertTrue(self.counted(self.beer))
+        self.assertEqual(self.stock.number_pourable(self.gin_sour), 0)
+
+    def test_type_requirements_invalidated_by_any_of_the_type(self):
+        self.stock.number_pourable(self.whiskey_sour)
+        other_bourbon = ingredients.list_ingredients(typ=Bourbon)[1]
+        self.stock.set_volume(other_bourbon, 640)
+        self.assertFalse(self.counted(self.whiskey_sour))
+
+    def test_shared_ingredient_invalidates_both(self):
+        for menu_item in (self.whiskey_sour, self.gin_sour):
+            self.stock.number_pourable(menu_item)
+        self.stock.set_volume(get_ingredient("lemon"), 0)
+        self.assertFalse(self.counted(self.whiskey_sour))
+        self.assertFalse(self.counted(self.gin_sour))
+        self.assertEqual(self.stock.number_pourable(self.whiskey_sour), 0)
+
+    def test_pouring_updates_counts(self):
+        before = self.stock.number_pourable(self.beer)
+        self.stock.fulfil([self.beer])
+        self.assertEqual(self.stock.number_pourable(self.beer), before - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from data import ingredients, taste_matrix
+from tests.helpers import load_catalog
+
+
+@unittest.skipIf(taste_matrix.np is None, "NumPy is not installed")
+class TasteMatrixTest(unittest.TestCase):
+    def setUp(self):
+        load_catalog()
+        self.matrix = taste_matrix.catalog_matrix()
+
+    def test_top_n_mask_ranks_with_column_ties(self):
+        np = taste_matrix.np
+        rng = random.Random(5)
+        # Few distinct values so ties are common
+        rows = np.array([[rng.choice([0, 0, 1, 2, 2, 3]) for _ in range(12)] for _ in range(200)], dtype=np.float32)
+        for n in (0, 1, 3, 5, 12):
+            mask = taste_matrix.TasteMatrix.top_n_mask(rows, n)
+            for row, marked in zip(rows, mask):
+                ranked = sorted(range(len(row)), key=lambda column: (-row[column], column))[:n]
+                expected = {column for column in ranked if row[column] > 0}
+                self.assertEqual(set(np.flatnonzero(marked)), expected)
+
+    def test_profile_matches_dict_profile(self):
+        for ingredient in ingredients.all_ingredients[:50]:
+            view = self.matrix.profile(ingredient)
+            profile = taste_matrix.source_profile(ingredient)
+            self.assertEqual(set(view), {taste for taste, points in profile.items() if points > 0})
+            for taste in view:
+                self.assertAlmostEqual(float(view[taste]), float(profile[taste]), places=1)
+
+    def test_row_follows_changed_ingredient(self):
+        ingredient = next(ingredient for ingredient in ingredients.all_ingredients
+                          if isinstance(ingredient, ingredients.MenuItem) and ingredient.flavor)
+        original = ingredient.flavor
+        before = dict(self.matrix.profile(ingredient))
+        try:
+            ingredient.flavor = "smoky"
+            self.assertNotEqual(dict(self.matrix.profile(ingredient)), before)
+            self.assertEqual(dict(self.matrix.profile(ingredient)).keys(), ingredient.cached_taste_profile().keys())
+        finally:
+            ingredient.flavor = original
+        self.assertEqual(dict(self.matrix.profile(ingredient)).keys(), ingredient.cached_taste_profile().keys())
+
+    def test_row_follows_profile_edited_in_place(self):
+        ingredient = next(ingredient for ingredient in ingredients.all_ingredients
+                          if not isinstance(ingredient, ingredients.MenuItem) and ingredient.taste_profile)
+        profile = ingredient.taste_profile
+        original = dict(profile)
+        taste = next(iter(profile))
+        try:
+            profile[taste] += 10
+            self.assertAlmostEqual(float(self.matrix.profile(ingredient)[taste]), float(profile[taste]), places=1)
+        finally:
+            profile.clear()
+            profile.update(original)
+        self.assertAlmostEqual(float(self.matrix.profile(ingredient)[taste]), float(original[taste]), places=1)
+
+    def test_rebuilt_when_catalog_changes(self):
+        ingredients.catalog_changed()
+        self.assertIsNot(taste_matrix.catalog_matrix(), self.matrix)
+
+    def test_stale_matrix_refuses_reads(self):
+        ingredients.catalog_changed()
+        with self.assertRaises(ValueError):
+            self.matrix.row(ingredients.all_ingredients[0])
+        self.assertEqual(taste_matrix.catalog_matrix().revision, ingredients.catalog_revision)
+
+
+if __name__ == "__main__":
+    unittest.main()
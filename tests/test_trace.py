@@ -0,0 +1,75 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from tests.helpers import make_bar
+from bar_pkg import simulation, trace as event_trace
+
+
+class EventTraceTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "day.trace")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_round_trip(self):
+        trace = event_trace.EventTrace(seed=1234)
+        trace.record(event_trace.ARRIVAL, 960, group=1, amount=2)
+        trace.record(event_trace.SALE, 975, group=1, customer="Zoë", item="Patrón Silver", amount=7.25)
+        trace.record(event_trace.COMMENT, 980, group=1, customer="Zoë", item="Ça, c'est délicieux! 🍸")
+        trace.record(event_trace.DEPARTURE, 1000, group=1, amount=2)
+        trace.save(self.path)
+
+        loaded = event_trace.load_trace(self.path)
+        self.assertEqual(loaded.seed, "1234")
+        self.assertEqual(list(loaded.events()), [
+            ("arrival", 960, 1, None, None, 2.0),
+            ("sale", 975, 1, "Zoë", "Patrón Silver", 7.25),
+            ("comment", 980, 1, "Zoë", "Ça, c'est délicieux! 🍸", 0.0),
+            ("departure", 1000, 1, None, None, 2.0),
+        ])
+        self.assertEqual([int(index) for index in loaded.of_kind(event_trace.SALE)], [1])
+
+    def test_long_strings_are_kept_whole(self):
+        # Longer than a 16-bit length, with a multibyte character across the old cut-off
+        comment = "a" * 0xFFFE + "é" * 10
+        trace = event_trace.EventTrace()
+        trace.record(event_trace.COMMENT, 960, customer="Raj", item=comment)
+        trace.save(self.path)
+        self.assertEqual(event_trace.load_trace(self.path).name(0), "Raj")
+        self.assertEqual(event_trace.load_trace(self.path).name(1), comment)
+
+    def test_loads_version_1_traces(self):
+        trace = event_trace.EventTrace(seed=7)
+        trace.record(event_trace.SALE, 975, group=1, customer="Zoë", item="Guinness Draught", amount=6)
+        with open(self.path, "wb") as file:
+            file.write(event_trace.header_format.pack(event_trace.magic, 1, len(trace), len(trace.strings), trace.seed_id))
+            for name, typecode in event_trace.columns:
+                file.write(getattr(trace, name).tobytes())
+            for string in trace.strings:
+                encoded = string.encode("utf-8")
+                file.write(struct.pack("<H", len(encoded)) + encoded)
+        self.assertEqual(list(event_trace.load_trace(self.path).events()),
+                         [("sale", 975, 1, "Zoë", "Guinness Draught", 6.0)])
+
+    def test_simulated_day_round_trip(self):
+        bar = make_bar()
+        opening_prices = {item.name: float(item.current_price()) for item in bar.menu.list_full_menu()}
+        report = simulation.simulate_day(bar, seed=5, trace=True)
+        report.trace.save(self.path)
+        loaded = event_trace.load_trace(self.path)
+        self.assertEqual(len(loaded), len(report.trace))
+        self.assertEqual(loaded.seed, str(report.seed))
+        sales = [(time, customer, item, amount) for kind, time, group, customer, item, amount
+                 in loaded.events(event_trace.SALE)]
+        self.assertEqual(sales, [(time, name, item, float(price)) for time, name, item, price in report.sales])
+        # Prices are fixed for the day, so the trace holds each menu item's price at opening
+        prices = {item: amount for kind, time, group, customer, item, amount in loaded.events(event_trace.PRICE_CHANGE)}
+        self.assertEqual(prices, opening_prices)
+
+
+if __name__ == '__main__':
+    unittest.main()
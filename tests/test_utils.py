@@ -0,0 +1,46 @@
+import unittest
+
+from rich.text import Text
+
+from utility import utils
+
+
+def visible(lines):
+    """The text each line shows, without its markup."""
+    return [Text.from_markup(line).plain for line in lines]
+
+
+class WrapMarkupTest(unittest.TestCase):
+    def test_short_string_is_unchanged(self):
+        self.assertEqual(utils.wrap_markup("[cstmr]Raj[/cstmr] enters.", 40), ("[cstmr]Raj[/cstmr] enters.",))
+
+    def test_lines_break_where_the_old_splitter_did(self):
+        # The old splitter carried the space it broke at over to the start of the next line
+        lines = utils.split_with_markup("[cstmr]Raj[/cstmr]: That's a [i]good[/i], fruity flavor.", 8)
+        self.assertEqual(visible(lines), ["Raj:", " That's", " a good,", " fruity", " flavor."])
+
+    def test_punctuation_stays_with_its_word(self):
+        lines = utils.wrap_markup("[cstmr]Cecil[/cstmr] leaves the [b]bar[/b].", 20)
+        self.assertEqual(visible(lines), ["Cecil leaves the", " bar."])
+        self.assertEqual(lines[1], " [b]bar[/b].")
+
+    def test_open_tags_carry_over_to_the_next_line(self):
+        lines = utils.wrap_markup("[u]underlined words that go on[/u] then plain", 16)
+        self.assertEqual(lines, ("[u]underlined words[/u]", " [u]that go on[/u] then", " plain"))
+
+    def test_no_tags_around_nothing(self):
+        lines = utils.wrap_markup("[i]a[/i][b] [/b][i]  [/i]bcdefghij", 6)
+        for line in lines:
+            self.assertNotIn("[i][/i]", line)
+            self.assertNotIn("[b]", line)
+        self.assertEqual(visible(lines), ["a", "   bcd", "efghij"])
+
+    def test_long_words_are_cut_to_width(self):
+        lines = utils.wrap_markup("[i]a[/i] [b]bcdefghij[/b]", 6)
+        self.assertEqual(lines, ("[i]a[/i]", " [b]bcdef[/b]", "[b]ghij[/b]"))
+        for line in visible(lines):
+            self.assertLessEqual(len(line), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
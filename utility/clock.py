@@ -3,9 +3,13 @@ import time
 from rich.panel import Panel
 
 from display.live_display import draw_live
+from display.rich_console import console
+
+game_mins_per_sec = 5  # How fast the game clock runs at 1x speed
+render_fps = 10  # How often the play screen is redrawn, whatever the speed
+# Speeds that can be chosen while playing. Unbounded runs the simulation as fast as it can between frames
+speeds = {"1x": 1, "10x": 10, "100x": 100, "unbounded": None}
 
-global game_mins_per_sec
-game_mins_per_sec = 5
 
 def clock_time(current_game_mins):
     clock_hours = (current_game_mins // 60) % 24
@@ -19,60 +23,182 @@ def print_time(mins):
     return f"{clock_hours:02}:{clock_minutes:02}"
 
 
-def current_game_mins(start_game_mins):
-    global game_mins_per_sec
-    elapsed_real_secs = time.perf_counter() - real_time_at_start
-    elapsed_game_mins = int(elapsed_real_secs * game_mins_per_sec)
-    current_mins = start_game_mins + elapsed_game_mins
-    return current_mins
+class GameClock:
+    """
+    A bar's in-game clock, which runs the simulation separately from drawing it. While running, real time is converted
+    to game minutes at the chosen speed, and before each frame the bar's customer events are caught up to that time in
+    one batch, each at its own minute. Frames are drawn at a fixed rate, however many minutes pass between them.
+    """
+
+    def __init__(self):
+        self.game_mins_per_sec = game_mins_per_sec
+        self.render_fps = render_fps
+        self.speed = 1  # Multiplier of game_mins_per_sec, or None for unbounded
+        self.game_mins = None  # The in-game time the simulation has been run up to
+        # The real and in-game times the clock last started counting from, reset on resuming or changing speed
+        self.anchor_real_time = None
+        self.anchor_game_mins = None
+
+    # <editor-fold desc="Running">
+    def resume(self, game_mins=None):
+        """
+        Starts the clock counting from the given in-game time.
+
+        :param game_mins: Where to start from. Leave None to carry on from where the clock was paused.
+        """
+        if game_mins is not None:
+            self.game_mins = game_mins
+        self.anchor_real_time = time.perf_counter()
+        self.anchor_game_mins = self.game_mins
+
+    def pause(self):
+        """Stops the clock, returning the in-game time it stopped at."""
+        self.anchor_real_time = None
+        return self.game_mins
+
+    def set_speed(self, speed):
+        """
+        Changes how fast in-game time passes, from the current in-game time on.
+
+        :param speed: A multiplier of the normal speed, or None to run as fast as possible.
+        """
+        self.speed = speed
+        if self.anchor_real_time is not None:
+            self.resume()
+
+    def speed_label(self):
+        """Returns the name of the current speed, as in speeds."""
+        for label, speed in speeds.items():
+            if speed == self.speed:
+                return label
+        return f"{self.speed}x"
+
+    def frame_secs(self):
+        """Seconds between redraws of the play screen."""
+        return 1 / self.render_fps
+
+    def due_game_mins(self):
+        """Returns the in-game time that real time passed since resuming has brought the clock to."""
+        elapsed_real_secs = time.perf_counter() - self.anchor_real_time
+        return self.anchor_game_mins + int(elapsed_real_secs * self.game_mins_per_sec * self.speed)
+
+    # </editor-fold>
+
+    def advance(self, occupancy, end_mins):
+        """
+        Runs the bar's customer events that have come due since the last frame, in order and each at its own minute.
+        When unbounded, runs for up to one frame's worth of real time instead.
+
+        :param occupancy: The occupancy of the bar being played.
+        :param end_mins: The in-game time to stop at, i.e. closing time.
+        :return: The in-game time the simulation has been run up to.
+        """
+        if self.speed is None:
+            target = end_mins
+            deadline = time.perf_counter() + self.frame_secs()
+        else:
+            target = min(self.due_game_mins(), end_mins)
+            deadline = None
+
+        # Fires anything due now, including the day's first customers
+        occupancy.check_customer_events(self.game_mins)
+        next_event = occupancy.next_event_time()
+        while next_event is not None and next_event <= target:
+            if deadline is not None and time.perf_counter() > deadline:
+                target = self.game_mins  # Pick up from here next frame
+                break
+            self.game_mins = next_event
+            occupancy.check_customer_events(next_event)
+            next_event = occupancy.next_event_time()
+        self.game_mins = max(self.game_mins, target)
+        return self.game_mins
 
 
 def run_clock(bar, start_game_mins, clock_panel, layout):
-    def start_clock():
-        global real_time_at_start
-        real_time_at_start = time.perf_counter()
+    """
+    Runs the play screen from the given in-game time until a key is pressed or the bar closes.
 
-    def update_play_layout(stop_func, live):
-        def update_clock():
-            current_mins = current_game_mins(start_game_mins)
-            clock_hours, clock_minutes = clock_time(current_mins)
+    :return: The in-game time the clock was paused at.
+    """
+    game_clock = bar.get_clock()
+    closing_time = bar.occupancy.closing_time
 
-            clock_panel.renderable = f"Sunday 01 Jan {clock_hours:02}:{clock_minutes:02}"
-            live.update(layout, refresh=False)
+    # What each region of the layout was last drawn from, so regions whose data hasn't changed aren't rebuilt
+    drawn = {}
+
+    def changed(region, signature):
+        """Returns True if the region needs redrawing, and records that it's being drawn from the given data."""
+        if region in drawn and drawn[region] == signature:
+            return False
+        drawn[region] = signature
+        return True
 
-            if clock_hours == 2:
-                stop_func()
-                bar.end_day()
-                global day_ended
-                day_ended = True
+    def update_play_layout(stop_func, live):
+        """Runs the simulation up to now and redraws the regions that changed. Returns False if none did."""
+        def update_clock():
+            clock_hours, clock_minutes = clock_time(game_clock.game_mins)
+            clock_text = f"Sunday 01 Jan {clock_hours:02}:{clock_minutes:02}"
+            if game_clock.speed != 1:
+                clock_text = f"{clock_text} ({game_clock.speed_label()})"
+            if changed("clock", clock_text):
+                clock_panel.renderable = clock_text
+                return True
+            return False
 
         def update_customer_count():
+            if not changed("customers", frozenset(bar.occupancy.current_customer_groups)):
+                return False
             layout["customers"].renderable.title = f"Customers ({len(bar.occupancy.current_customers())})"
             layout["customers"].renderable.renderable = bar.occupancy.print_customers()
+            return True
 
         def update_balance():
+            if not changed("balance", bar.bar_stats.balance):
+                return False
             layout["balance"].renderable.renderable = f"Balance: [money]${"{:.2f}".format(bar.bar_stats.balance)}"
+            return True
 
         def update_customer_panel():
-            if bar.occupancy.customer_displayed is None:
+            cstmr = bar.occupancy.customer_displayed
+            if not changed("customer_panel", (cstmr, cstmr.panel_signature() if cstmr else None)):
+                return False
+            if cstmr is None:
                 layout["customer_panel"].update(Panel(renderable=f"[dimmed]None"))
             else:
-                layout["customer_panel"].update(bar.occupancy.customer_displayed.customer_panel())
-
-        global day_ended
-        day_ended = False
-        update_clock()
-        # Ensure customer events are not run so that the last customer entry time stays at None after being reset
-        if day_ended:
-            return
-        bar.occupancy.check_customer_events(current_game_mins(start_game_mins))
-        update_customer_count()
-        update_customer_panel()
-        update_balance()
-        layout["event_log"].update(bar.occupancy.event_log_panel())
-
-    start_clock()
-    global game_mins_per_sec
-    draw_live(update_function=update_play_layout, sec=1 / game_mins_per_sec) # Runs until input is detected then pauses
+                layout["customer_panel"].update(cstmr.customer_panel())
+            return True
+
+        def update_event_log():
+            # The occupancy hands back the same panel until new lines are logged
+            log_panel = bar.occupancy.event_log_panel()
+            if not changed("event_log", log_panel):
+                return False
+            layout["event_log"].update(log_panel)
+            return True
+
+        # Everything has to be redrawn at a new size
+        if changed("console", console.size):
+            for region in list(drawn):
+                if region != "console":
+                    del drawn[region]
+
+        game_clock.advance(bar.occupancy, closing_time)
+        redraw = update_clock()
+        if game_clock.game_mins >= closing_time:
+            stop_func()
+            bar.end_day(game_clock.game_mins)
+            live.update(layout, refresh=False)
+            return True
+        # Each is run (not short-circuited) so every changed region is brought up to date
+        redraw = update_customer_count() | redraw
+        redraw = update_customer_panel() | redraw
+        redraw = update_balance() | redraw
+        redraw = update_event_log() | redraw
+        if redraw:
+            live.update(layout, refresh=False)
+        return redraw
+
+    game_clock.resume(start_game_mins)
+    draw_live(update_function=update_play_layout, sec=game_clock.frame_secs()) # Runs until input is detected then pauses
     # Returns the in-game time that the game was paused at
-    return current_game_mins(start_game_mins)
+    return game_clock.pause()
@@ -1,11 +1,13 @@
+import atexit
 import datetime
 import inspect
 import logging
 import os
+import queue
 import sys
 import traceback
 import types
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from display.rich_console import console
 
@@ -18,10 +20,85 @@ def filename():
     return os.path.join(logs_dir, f"{now}.log")
 
 
-def log(msg):
-    """Prints to log only with timestamp."""
-    timestamp = datetime.datetime.now().strftime("%H:%M:%S.%f")[:12]
-    logger.info(f"{timestamp} - {msg}")
+def process_filename(pid):
+    """Returns the file a forked process with the given id logs to, named after the parent's log file."""
+    return f"{os.path.splitext(filename)[0]}-{pid}.log"
+
+
+def make_file_handler(path, delay=False):
+    """
+    Returns a size capped handler writing timestamped records to the given file.
+
+    :param delay: Whether to wait for the first record before creating the file.
+    """
+    handler = RotatingFileHandler(path, maxBytes=10 * 1024 * 1024, backupCount=5, delay=delay)
+    handler.setFormatter(logging.Formatter("%(asctime)s.%(msecs)03d - %(message)s", datefmt="%H:%M:%S"))
+    return handler
+
+
+def get_logger(subsystem=None):
+    """Returns the logger for the given part of the game, e.g. "stock", or the root logger if None."""
+    sub_logger = subsystem_loggers.get(subsystem)
+    if sub_logger is None:
+        sub_logger = subsystem_loggers[subsystem] = logging.getLogger(subsystem)
+    return sub_logger
+
+
+def log(msg, *args, subsystem=None, level=logging.INFO):
+    """
+    Prints to log only with timestamp. The file is written on a background thread.
+
+    :param msg: The message; a %-style format string filled in from args, or a callable that returns the message. Either
+    way, the message is only built if it will actually be logged.
+    :param subsystem: The part of the game logging, e.g. "stock", whose level decides whether it's logged.
+    :param level: The logging level, e.g. logging.DEBUG for verbose tracing.
+    """
+    sub_logger = get_logger(subsystem)
+    if not sub_logger.isEnabledFor(level):
+        return
+    if callable(msg):
+        msg = msg()
+    sub_logger.log(level, msg, *args)
+
+
+def trace(subsystem, msg, *args):
+    """
+    Logs verbose detail from the given subsystem, such as each point of a drink's score. Skipped without building the
+    message unless tracing is turned on for the subsystem (see set_level and TAVERN_TRACE).
+    """
+    log(msg, *args, subsystem=subsystem, level=logging.DEBUG)
+
+
+def set_level(subsystem, level):
+    """Sets the level one subsystem logs at, e.g. set_level("customer", logging.DEBUG) to trace drink scoring."""
+    get_logger(subsystem).setLevel(level)
+
+
+def pause_writer():
+    """
+    Holds the file handler's lock while the process forks. The writer thread only touches the file under this lock, so
+    it can't be part way through a write, holding the file's own lock, when the child is copied from this process.
+    """
+    file_handler.acquire()
+
+
+def resume_writer():
+    """Lets the writer thread carry on once the parent process has forked."""
+    file_handler.release()
+
+
+def write_directly():
+    """
+    Writes log records on the thread logging them, to a file of this process's own. Forked processes (e.g. simulation
+    workers) don't have the parent's writer thread, so records queued there would never be written, and sharing the
+    parent's file handler would interleave their records and break its rollover.
+    """
+    global file_handler
+    for handler in logger.handlers[:]:
+        if isinstance(handler, QueueHandler) or handler is file_handler:
+            logger.removeHandler(handler)
+    file_handler = make_file_handler(process_filename(os.getpid()), delay=True)  # Workers that never log leave no file
+    logger.addHandler(file_handler)
 
 
 def logprint(msg):
@@ -32,7 +109,8 @@ def logprint(msg):
 
 def delete_oldest_log(log_dir, max_files):
     log_files = os.listdir(log_dir)
-    log_files = [os.path.join(log_dir, f) for f in log_files]
+    # Only files; folders such as the event log archives are left alone
+    log_files = [os.path.join(log_dir, f) for f in log_files if os.path.isfile(os.path.join(log_dir, f))]
     log_files.sort(key=lambda x: os.path.getmtime(x))
     if len(log_files) > max_files:
         os.remove(log_files[0])
@@ -98,11 +176,24 @@ if not os.path.exists(logs_dir):
 filename = filename()
 
 logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
-
-file_handler = RotatingFileHandler(filename, maxBytes=10 * 1024 * 1024, backupCount=5)
-
-logger.addHandler(file_handler)
+# Verbose tracing is logged at DEBUG, so it's off unless turned on for a subsystem
+logger.setLevel(logging.INFO)
+subsystem_loggers = {}  # {subsystem name: logger}, see get_logger
+
+file_handler = make_file_handler(filename)
+
+# Logging only queues the record; a background thread stamps and writes it to the file
+log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(log_queue))
+queue_listener = QueueListener(log_queue, file_handler)
+queue_listener.start()
+atexit.register(queue_listener.stop)  # Writes out anything still queued
+os.register_at_fork(before=pause_writer, after_in_parent=resume_writer, after_in_child=write_directly)
+
+# Subsystems to trace from the start, e.g. TAVERN_TRACE=customer,stock
+for traced_subsystem in os.environ.get("TAVERN_TRACE", "").split(","):
+    if traced_subsystem.strip():
+        set_level(traced_subsystem.strip(), logging.DEBUG)
 
 sys.excepthook = log_exception
 
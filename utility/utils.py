@@ -1,3 +1,4 @@
+import functools
 import math
 import os
 import pickle
@@ -9,6 +10,8 @@ from display.rich_console import console
 from utility import logger
 
 current_bar = None
+# Rich markup tags, found as Rich finds them: brackets starting with a letter, #, / or @, unless escaped by a backslash
+markup_tag = re.compile(r"(\\*)\[([a-z#/@][^[]*?)]")
 
 
 # <editor-fold desc="Savefiles">
@@ -25,6 +28,11 @@ def save_bar(bar_obj):
         logger.logprint(f"Game saved as {filename}")
 
 
+def event_log_path(bar_obj):
+    """Returns the file the bar's full event log history is archived to, in the events folder of the logs directory."""
+    return os.path.join(logger.logs_dir, "events", bar_obj.bar_stats.bar_name + ".log")
+
+
 def list_saves():
     """Returns a list of save file names in the directory."""
     file_names = [save_file for save_file in os.listdir() if save_file.endswith(".pickle")]
@@ -70,50 +78,32 @@ def format_a(following_string: str):
         return "a"
 
 
-def index_with_markup(string: str, no_markup_index: int):
-    """
-    Returns the index of the given marked-up string that corresponds with the given index in a no-markup version of the
-    string. I.e. give a position in a plain string, get an index of the same actual char position in the marked-up string
-
-    :param string: Marked-up string to find a corresponding index for
-    :param no_markup_index: The target index in the no-markup/actual-appearance string
-    :return: The corresponding char's index in the original marked-up string
-    """
-    no_markup_str = remove_markup(string)
-    if len(no_markup_str) - 1 < no_markup_index:  # Index at end if shorter than index given
-        no_markup_index = len(no_markup_str) - 1
-
-    no_markup_counter = 0
-    in_tag = False
-    for markup_index, char in enumerate(string):
-        if no_markup_counter >= no_markup_index:
-            if string[markup_index] == no_markup_str[no_markup_index]:
-                return markup_index
-            else:
-                logger.logprint("[error]Markup index char doesn't match no markup index char")
-
-        if char == "[":
-            in_tag = True
-        elif char == "]":
-            in_tag = False
-        elif not in_tag:
-            no_markup_counter += 1
+def numb_lines(string, line_width):
+    """Returns how many lines of the given width the string's visible characters fill."""
+    line_width = int(line_width)
+    return max(1, math.ceil(len(remove_markup(string)) / line_width))
 
-    if string[markup_index] == no_markup_str[no_markup_index]:
-        return markup_index
-    else:
-        logger.logprint("[error]Markup index char doesn't match no markup index char")
 
+def parse_markup(string):
+    """
+    Splits a marked-up string into spans in one pass.
 
-def numb_lines(string, line_width):
-    line_width = int(line_width)
-    string = remove_markup(string)
-    if len(string) <= line_width:
-        return 1
-    else:
-        remainder = string[line_width:]
-        lines_in_remainder = numb_lines(remainder, line_width)
-    return 1 + lines_in_remainder
+    :return: A list of (tag, text) tuples: a tag (without brackets) with empty text, or text with a tag of None.
+    """
+    spans = []
+    position = 0
+    for match in markup_tag.finditer(string):
+        backslashes, tag = match.groups()
+        if len(backslashes) % 2:  # Escaped, so the bracket is plain text
+            continue
+        tag_start = match.start() + len(backslashes)
+        if tag_start > position:
+            spans.append((None, string[position:tag_start]))
+        spans.append((tag, ""))
+        position = match.end()
+    if position < len(string):
+        spans.append((None, string[position:]))
+    return spans
 
 
 def percentize(numbers: list | dict):
@@ -144,7 +134,12 @@ def remove_markup(string):
     return re.sub(r"\[.*?\]", "", string)
 
 
-def roll_probabilities(choices):
+def roll_probabilities(choices, rng=random):
+    """
+    Picks one of the given choices, weighted by their values if given a dict of float probabilities.
+
+    :param rng: The random stream to draw from. Defaults to the global random module.
+    """
     if not choices:
         return None
     # If there are weights, use them
@@ -152,10 +147,10 @@ def roll_probabilities(choices):
         if isinstance(list(choices.values())[0], float):
             if not 0.99 < sum(choices.values()) < 1.01:
                 logger.log("Probabilities do not sum to 1!")
-            return random.choices(list(choices.keys()), weights=list(choices.values()))[0]
+            return rng.choices(list(choices.keys()), weights=list(choices.values()))[0]
 
     # If there are no weights, return a random choice
-    return random.choices(list(choices))[0]
+    return rng.choices(list(choices))[0]
 
 
 def split_with_markup(string: str, line_width):
@@ -166,54 +161,99 @@ def split_with_markup(string: str, line_width):
     :param line_width: Maximum length of each line
     :return: List of lines from the string
     """
+    return list(wrap_markup(string, int(line_width)))
+
+
+@functools.lru_cache(maxsize=1024)
+def wrap_markup(string, line_width):
+    """
+    Word-wraps a marked-up string to the given visible width in a single pass over its spans. Words run across tags, so
+    lines only break at spaces, never between a word and punctuation after its closing tag. Tags still open at the
+    end of a line are closed there and reopened at the start of the next, so every line is balanced on its own, and
+    tags are only opened just before text that uses them.
+    Results are cached, since the same messages are wrapped to the same widths over and over.
+
+    :return: A tuple of the lines.
+    """
+    spans = parse_markup(string)
+    if sum(len(text) for tag, text in spans) <= line_width:
+        return (string,)
+    line_width = max(line_width, 1)
+
     lines = []
-    num_lines = numb_lines(string, line_width)
-    if num_lines > 1:
-        for line_num in range(num_lines):
-            # Start line_num at 1, not 0, for comparison with num_lines
-            line_num += 1
-
-            # Split at end if shorter than max
-            split_index = line_width if len(remove_markup(string)) > line_width else len(remove_markup(string)) - 1
-            markup_split_index = index_with_markup(string, split_index)
-
-            # Jump to end of markup on last line
-            if line_num == num_lines and len(string) > markup_split_index:
-                markup_split_index = len(string)
-
-            # Backtrack to last space so no terms are cut off
-            if markup_split_index < len(string) - 1:
-                while True:
-                    if string[markup_split_index] == " ":
-                        break
-                    markup_split_index -= 1
-
-            cut_section = string[:markup_split_index]
-            # Remainder for processing next
-            string = string[markup_split_index:]
-
-            all_tags = re.findall(r"\[[^]]*\]", cut_section)
-            open_tags = {}
-
-            tag_fixed_str = cut_section
-            for tag in all_tags:
-                if tag.startswith("[/"):  # Closing tag
-                    tag_word = tag[2:-1]
-                    if tag_word in open_tags and open_tags[tag_word] > 0:
-                        open_tags[tag_word] -= 1  # Mark open tag as closed
-                    else:  # If closing tag is unmatched
-                        tag_fixed_str = f"[{tag_word}]" + tag_fixed_str  # Open tag to match
-                elif tag.startswith("["):  # Opening tag
-                    open_tags[tag[1:-1]] = open_tags.get(tag[1:-1], 0) + 1  # Mark open tag
-
-            # Close tags left open
-            for tag_word, count in open_tags.items():
-                if count > 0:
-                    tag_fixed_str = tag_fixed_str + f"[/{tag_word}]"
-            lines.append(tag_fixed_str)
-    else:
-        lines.append(string)
-    return lines
+    line = []  # Pieces of the current line
+    line_length = 0  # Visible characters in the current line
+    line_tags = []  # Tags opened so far in the current line, outermost first
+
+    def add_text(tags, text, open_tags=True):
+        nonlocal line_length
+        # Bring the line's tags in line with the text's: close those that have ended, then open any new ones. Spaces
+        # don't open tags, so no tag is ever opened around nothing but spaces
+        shared = 0
+        while shared < min(len(line_tags), len(tags)) and line_tags[shared] == tags[shared]:
+            shared += 1
+        while len(line_tags) > shared:
+            line.append(f"[/{line_tags.pop()}]")
+        if open_tags:
+            for tag in tags[shared:]:
+                line.append(f"[{tag}]")
+                line_tags.append(tag)
+        line.append(text)
+        line_length += len(text)
+
+    def break_line():
+        nonlocal line, line_length
+        lines.append("".join(line) + "".join(f"[/{tag}]" for tag in reversed(line_tags)))
+        line = []
+        line_length = 0
+        line_tags.clear()
+
+    def add_word(spaces, word):
+        """Adds a word, made of (tags, text) pieces, and the spaces before it, to the line it fits on."""
+        spaces_length = sum(len(text) for tags, text in spaces)
+        if line_length and line_length + spaces_length + sum(len(text) for tags, text in word) > line_width:
+            break_line()  # The spaces start the next line, as they always have
+        for tags, text in spaces:
+            add_text(tags, text, open_tags=False)
+        for tags, text in word:
+            while line_length + len(text) > line_width:  # A single word longer than the line is cut
+                room = line_width - line_length
+                if room:
+                    add_text(tags, text[:room])
+                    text = text[room:]
+                break_line()
+            add_text(tags, text)
+
+    open_tags = []  # Tags open at this point in the string, outermost first
+    spaces = []  # (tags, text) pieces of the spaces before the word being read
+    word = []  # (tags, text) pieces of the word being read, which may run across several tags
+    for tag, text in spans:
+        if tag is not None:
+            if not tag.startswith("/"):
+                open_tags.append(tag)
+            elif tag == "/":  # [/] closes the last open tag
+                if open_tags:
+                    open_tags.pop()
+            elif tag[1:] in open_tags:
+                del open_tags[len(open_tags) - 1 - open_tags[::-1].index(tag[1:])]
+            # A closing tag that closes nothing is dropped, since Rich would refuse to render it
+            continue
+
+        for part in re.split(r"( +)", text):
+            if not part:
+                continue
+            if part.startswith(" "):
+                if word:
+                    add_word(spaces, word)
+                    spaces, word = [], []
+                spaces.append((tuple(open_tags), part))
+            else:
+                word.append((tuple(open_tags), part))
+    if word:
+        add_word(spaces, word)
+
+    break_line()
+    return tuple(lines)
 
 
 def split_with_quotes(inpt):